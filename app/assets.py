@@ -0,0 +1,83 @@
+"""Assets estáticos (CSS/JS) servidos con URL con hash de contenido.
+
+Cada asset se comprime una sola vez al arrancar (gzip y, si está instalado
+el paquete ``brotli``, también br). Como la URL cambia cuando cambia el
+contenido, el navegador puede guardarlo para siempre (``immutable``).
+"""
+import gzip
+import hashlib
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él sólo se sirve gzip
+    brotli = None
+
+router = APIRouter()
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """Elige la mejor codificación disponible según Accept-Encoding (br > gzip > identity)."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+class StaticAsset:
+    def __init__(self, name: str, ext: str, content: str, media_type: str):
+        body = content.encode()
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.filename = f"{name}.{self.digest}.{ext}"
+        self.url = f"/static/{self.filename}"
+        self.media_type = media_type
+        self.variants = {"identity": body, "gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def response(self, accept_encoding: str) -> Response:
+        encoding = negotiate_encoding(accept_encoding, self.variants)
+        headers = {
+            "Cache-Control": IMMUTABLE,
+            "ETag": f'"{self.digest}-{encoding}"',
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+_assets: dict[str, StaticAsset] = {}
+
+
+def register_asset(name: str, ext: str, content: str, media_type: str) -> StaticAsset:
+    asset = StaticAsset(name, ext, content, media_type)
+    _assets[asset.filename] = asset
+    return asset
+
+
+@router.get("/{filename}")
+def static_asset(filename: str, request: Request):
+    asset = _assets.get(filename)
+    if asset is None:
+        return Response(status_code=404)
+    if request.headers.get("if-none-match", "").strip('"').startswith(asset.digest):
+        return Response(status_code=304, headers={"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"})
+    return asset.response(request.headers.get("accept-encoding", ""))
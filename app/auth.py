@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from fastapi.responses import RedirectResponse
 from app.config import settings
-from app.meli_client import meli
+from app.state import state_backend
 import httpx
 import traceback
 import secrets
@@ -71,11 +71,12 @@ async def callback(code: str, state: str = ""):
                 },
             }
 
-        # Guardar tokens en memoria
-        settings.ACCESS_TOKEN = response_data["access_token"]
-        if "refresh_token" in response_data:
-            settings.REFRESH_TOKEN = response_data["refresh_token"]
-        meli.token = response_data["access_token"]
+        # Guardar tokens en el backend de estado (compartido entre workers)
+        _, current_refresh = state_backend.get_tokens()
+        state_backend.set_tokens(
+            response_data["access_token"],
+            response_data.get("refresh_token", current_refresh),
+        )
 
         return {
             "status": "authenticated",
@@ -0,0 +1,143 @@
+"""Middleware ASGI de compresión para respuestas HTML/JSON.
+
+- Negocia br/gzip con Accept-Encoding (br sólo si está el paquete brotli).
+- Respuestas completas por debajo de ``minimum_size`` se mandan tal cual.
+- Las respuestas completas se comprimen una vez y se guardan en un LRU
+  por hash del cuerpo: cuerpos estáticos (layout, JSON que no cambió) no se
+  recomprimen en cada petición.
+- Las respuestas en streaming se comprimen trozo por trozo con flush, sin
+  acumular el cuerpo, así que cada trozo llega al cliente en cuanto sale.
+"""
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+from app.assets import brotli, negotiate_encoding
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "application/json",
+    "application/javascript",
+)
+
+AVAILABLE_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, 6, mtime=0)
+
+
+class _StreamEncoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=5)
+            self._zlib = None
+        else:
+            self._br = None
+            self._zlib = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._br is not None:
+            return self._br.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, cache_size: int = 64):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+
+    def _cached_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            return compressed
+        compressed = _compress(body, encoding)
+        self._cache[key] = compressed
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), AVAILABLE_ENCODINGS)
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        mode = None  # None hasta el primer trozo; luego "passthrough" o "stream"
+        encoder: _StreamEncoder | None = None
+
+        def prepare_headers(message) -> MutableHeaders:
+            headers = MutableHeaders(scope=message)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            # Otra representación, otro ETag fuerte
+            if etag and etag.endswith('"') and not etag.startswith("W/"):
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            return headers
+
+        async def wrapped_send(message):
+            nonlocal start_message, mode, encoder
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if mode is None:
+                headers = Headers(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                compressible = (
+                    "content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if not compressible or (not more_body and len(body) < self.minimum_size):
+                    mode = "passthrough"
+                    await send(start_message)
+                    await send(message)
+                    return
+                if not more_body:
+                    compressed = self._cached_compress(body, encoding)
+                    headers = prepare_headers(start_message)
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                    return
+                mode = "stream"
+                encoder = _StreamEncoder(encoding)
+                headers = prepare_headers(start_message)
+                del headers["Content-Length"]
+                await send(start_message)
+
+            if mode == "passthrough":
+                await send(message)
+                return
+
+            data = encoder.chunk(body) if body else b""
+            if not more_body:
+                data += encoder.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, wrapped_send)
@@ -9,12 +9,67 @@ class Settings(BaseSettings):
     REFRESH_TOKEN: str = ""
     USER_ID: str = ""
 
-    # IPs permitidas (separadas por coma). Si está vacío, permite todo.
+    # IPs permitidas (separadas por coma; acepta CIDR e IPv6). Si está
+    # vacío, permite todo. ALLOWED_IPS_FILE agrega entradas desde un archivo
+    # (una por línea); ambos se recargan en caliente.
     ALLOWED_IPS: str = ""
+    ALLOWED_IPS_FILE: str = ""
+    ALLOWED_IPS_RELOAD_SECONDS: int = 30
+
+    # Proxies cuyo X-Forwarded-For se cree: "*" cualquiera (la primera IP
+    # del header), "" ninguno, o lista de IPs/CIDR del proxy (Railway, etc.)
+    TRUSTED_PROXIES: str = "*"
 
     # URL de tu otra página que recibe las notificaciones de ML
     EXTERNAL_WEBHOOK_SOURCE: str = ""
 
+    # Dónde viven órdenes y tokens: "memory" (un solo worker) o "sqlite"
+    # (necesario para correr uvicorn con --workers N)
+    STATE_BACKEND: str = "memory"
+    STATE_DB_PATH: str = "state.db"
+
+    # Eventos de cambio que se conservan para /orders/changes
+    CHANGE_LOG_SIZE: int = 1000
+
+    # Segundos que una orden entregada/cancelada sigue visible antes de borrarse
+    COMPLETED_GRACE_SECONDS: int = 300
+
+    # Copia de los envíos pendientes de ML: cada cuánto la refresca el
+    # scheduler y a partir de qué edad una página la refresca por su cuenta
+    SNAPSHOT_REFRESH_SECONDS: int = 45
+    SNAPSHOT_MAX_AGE_SECONDS: int = 60
+
+    # Tarjetas de pedido renderizadas que se conservan en cache (LRU)
+    FRAGMENT_CACHE_SIZE: int = 5000
+
+    # Ventanas de las ventas por producto (/notifications/stock-alert) y
+    # buckets por ventana: más buckets, más precisión y más memoria
+    SALES_WINDOWS: str = "1h,24h,7d"
+    SALES_WINDOW_BUCKETS: int = 60
+
+    # Miniaturas de productos reducidas y guardadas en disco (/thumbs)
+    THUMBS_DIR: str = "thumbs_cache"
+    THUMBS_MAX_BYTES: int = 50 * 1024 * 1024
+
+    # Avisos push de pedidos urgentes/demorados: POST JSON a PUSH_HTTP_URL
+    # y/o Web Push a navegadores (claves VAPID, requiere pywebpush).
+    # Se juntan PUSH_BATCH_SECONDS, cada canal envía a lo más uno cada
+    # PUSH_MIN_INTERVAL_SECONDS y cada pedido se avisa una vez por
+    # PUSH_DEDUPE_SECONDS. El dedupe y las suscripciones Web Push viven en
+    # el backend de estado (se comparten y persisten con STATE_BACKEND=sqlite).
+    PUSH_HTTP_URL: str = ""
+    PUSH_BATCH_SECONDS: int = 10
+    PUSH_MIN_INTERVAL_SECONDS: int = 60
+    PUSH_DEDUPE_SECONDS: int = 6 * 3600
+    VAPID_PUBLIC_KEY: str = ""
+    VAPID_PRIVATE_KEY: str = ""
+    VAPID_SUBJECT: str = "mailto:admin@example.com"
+
+    # Reconciliación contra /orders/search por si se pierde algún webhook
+    RECONCILE_INTERVAL_SECONDS: int = 300
+    RECONCILE_PAGES_PER_RUN: int = 2
+    RECONCILE_LOOKBACK_DAYS: int = 14
+
     class Config:
         env_file = ".env"
 
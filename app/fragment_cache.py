@@ -0,0 +1,43 @@
+from collections import OrderedDict
+from typing import Callable, Hashable
+from app.config import settings
+
+
+class FragmentCache:
+    """Cache LRU de fragmentos HTML ya renderizados.
+
+    La llave debe incluir todo lo que cambia el HTML (versión del contenido,
+    bucket de tiempo), así que nunca hay que invalidar: las entradas viejas
+    simplemente dejan de pedirse y salen por LRU.
+    """
+
+    def __init__(self, maxsize: int = 5000):
+        self.maxsize = maxsize
+        self._items: OrderedDict[Hashable, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        html = self._items.get(key)
+        if html is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return html
+        self.misses += 1
+        html = render()
+        self._items[key] = html
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return html
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# Instancia global
+fragment_cache = FragmentCache(maxsize=settings.FRAGMENT_CACHE_SIZE)
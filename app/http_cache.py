@@ -0,0 +1,46 @@
+"""ETags fuertes y respuestas 304 para páginas y APIs derivadas de datos versionados."""
+import time
+from fastapi import Request
+from fastapi.responses import Response
+
+# Las etiquetas relativas ("5h restantes", DEMORADO) se recalculan a lo más
+# con este retraso: el bucket de tiempo forma parte del ETag.
+LABEL_BUCKET_SECONDS = 60
+
+# El compresor agrega -gzip / -br al ETag de la representación comprimida
+_ENCODING_SUFFIXES = ("", "-gzip", "-br")
+
+
+def label_bucket(now: float | None = None) -> int:
+    return int((now if now is not None else time.time()) // LABEL_BUCKET_SECONDS)
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True si If-None-Match incluye ``etag`` (en cualquiera de sus codificaciones)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = etag.strip('"')
+    accepted = {tag + suffix for suffix in _ENCODING_SUFFIXES}
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') in accepted:
+            return True
+    return False
+
+
+def cache_headers(etag: str) -> dict:
+    """Headers para que el cliente guarde la respuesta pero revalide siempre."""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,182 @@
+"""Lista de IPs permitidas (``ALLOWED_IPS``) con rangos CIDR e IPv6.
+
+La lista se compila una vez en un trie binario por familia de direcciones;
+revisar una IP recorre a lo más tantos nodos como bits tiene el prefijo más
+largo (32 en IPv4, 128 en IPv6), sin importar cuántas entradas haya.
+
+``ip_access.reload_if_changed`` (job del scheduler) vuelve a leer
+``ALLOWED_IPS`` del ``.env`` y, si está configurado, ``ALLOWED_IPS_FILE``
+(una entrada por línea, ``#`` para comentarios); sólo recompila si cambió.
+
+``TRUSTED_PROXIES`` decide de quién se acepta ``X-Forwarded-For``:
+- ``*`` (default): de cualquiera; la IP del cliente es la primera del header.
+- vacío: de nadie; cuenta sólo la IP de la conexión.
+- lista de IPs/CIDR: el header se recorre de derecha a izquierda saltando
+  los proxies de confianza; la IP del cliente es el primer salto que no lo es.
+"""
+import ipaddress
+import logging
+import os
+from app.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+
+class CIDRTrie:
+    """Trie binario de prefijos de red de una familia (IPv4 o IPv6)."""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        # Nodo: [hijo 0, hijo 1, termina aquí un prefijo]
+        self.root: list = [None, None, False]
+
+    def insert(self, value: int, prefixlen: int) -> None:
+        node = self.root
+        for i in range(prefixlen):
+            if node[2]:
+                return  # ya lo cubre un prefijo más corto
+            bit = (value >> (self.bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        node[2] = True
+        node[0] = node[1] = None  # lo que colgaba debajo queda cubierto
+
+    def contains(self, value: int) -> bool:
+        node = self.root
+        for i in range(self.bits):
+            if node[2]:
+                return True
+            node = node[(value >> (self.bits - 1 - i)) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+def _parse_ip(text: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+    try:
+        ip = ipaddress.ip_address(text.strip())
+    except ValueError:
+        return None
+    # ::ffff:1.2.3.4 cuenta como la IPv4 que envuelve
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        return ip.ipv4_mapped
+    return ip
+
+
+class IPAllowlist:
+    """Conjunto de redes (IPs sueltas o CIDR, IPv4 e IPv6) compilado en tries."""
+
+    def __init__(self, entries: list[str]):
+        self.entries: list[str] = []
+        self.invalid: list[str] = []
+        self._tries = {4: CIDRTrie(32), 6: CIDRTrie(128)}
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                self.invalid.append(entry)
+                continue
+            if network.version == 6 and network.network_address.ipv4_mapped is not None and network.prefixlen >= 96:
+                network = ipaddress.ip_network(
+                    f"{network.network_address.ipv4_mapped}/{network.prefixlen - 96}", strict=False
+                )
+            self._tries[network.version].insert(int(network.network_address), network.prefixlen)
+            self.entries.append(str(network))
+        if self.invalid:
+            logger.warning("Entradas inválidas en la lista de IPs, se ignoran: %s", ", ".join(self.invalid))
+
+    @classmethod
+    def parse(cls, spec: str) -> "IPAllowlist":
+        """Entradas separadas por coma o por línea; ``#`` inicia un comentario."""
+        entries = []
+        for line in spec.splitlines():
+            line = line.split("#", 1)[0]
+            entries.extend(part.strip() for part in line.split(",") if part.strip())
+        return cls(entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, ip: str) -> bool:
+        parsed = _parse_ip(ip)
+        return parsed is not None and self._tries[parsed.version].contains(int(parsed))
+
+
+class IPAccessControl:
+    """Lista de permitidas + proxies de confianza, recargables en caliente."""
+
+    def __init__(self, allowed_spec: str, trusted_spec: str, allowed_file: str = ""):
+        self.allowed_file = allowed_file
+        self._spec: tuple | None = None
+        self._file_mtime: float | None = None
+        self._file_text = ""
+        self.reloads = 0
+        self.allowlist = IPAllowlist([])
+        self.configured = False
+        self.trust_all = False
+        self.trusted = IPAllowlist([])
+        self._apply(allowed_spec, trusted_spec, self._read_file())
+
+    def _read_file(self) -> str:
+        if not self.allowed_file:
+            return ""
+        try:
+            mtime = os.stat(self.allowed_file).st_mtime
+        except OSError:
+            return ""
+        if mtime != self._file_mtime:
+            with open(self.allowed_file) as f:
+                self._file_text = f.read()
+            self._file_mtime = mtime
+        return self._file_text
+
+    def _apply(self, allowed_spec: str, trusted_spec: str, file_text: str) -> bool:
+        spec = (allowed_spec, trusted_spec, file_text)
+        if spec == self._spec:
+            return False
+        self._spec = spec
+        self.allowlist = IPAllowlist.parse(allowed_spec + "\n" + file_text)
+        # Hay lista configurada aunque ninguna entrada sea válida: en ese
+        # caso se niega a todos en vez de abrir la app
+        self.configured = bool(self.allowlist.entries or self.allowlist.invalid)
+        if self.configured and not self.allowlist:
+            logger.error("ALLOWED_IPS no tiene ninguna entrada válida: se niega el acceso a todos")
+        self.trust_all = trusted_spec.strip() == "*"
+        self.trusted = IPAllowlist([]) if self.trust_all else IPAllowlist.parse(trusted_spec)
+        self.reloads += 1
+        return True
+
+    async def reload_if_changed(self) -> None:
+        """Vuelve a leer .env y ALLOWED_IPS_FILE; recompila sólo si algo cambió."""
+        fresh = Settings()
+        self.allowed_file = fresh.ALLOWED_IPS_FILE
+        if self._apply(fresh.ALLOWED_IPS, fresh.TRUSTED_PROXIES, self._read_file()):
+            logger.info("Lista de IPs recargada: %d permitidas, %d proxies", len(self.allowlist), len(self.trusted))
+
+    def client_ip(self, peer: str | None, forwarded: str | None) -> str:
+        """IP del cliente según la conexión y X-Forwarded-For."""
+        peer = peer or ""
+        if not forwarded:
+            return peer
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if self.trust_all:
+            return hops[0] if hops else peer
+        if peer not in self.trusted:
+            return peer
+        for hop in reversed(hops):
+            if hop not in self.trusted:
+                return hop
+        return hops[0] if hops else peer
+
+    def is_allowed(self, peer: str | None, forwarded: str | None) -> bool:
+        if not self.configured:
+            return True  # sin lista se permite todo
+        return self.client_ip(peer, forwarded) in self.allowlist
+
+
+# Instancia global
+ip_access = IPAccessControl(settings.ALLOWED_IPS, settings.TRUSTED_PROXIES, settings.ALLOWED_IPS_FILE)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from collections import deque
+
+
+class LiveHub:
+    """Reparte eventos en vivo (SSE) a todas las pestañas conectadas.
+
+    Los eventos se generan una sola vez por cambio (normalmente al refrescar
+    el snapshot) y se copian a la cola de cada suscriptor: muchas pestañas
+    abiertas no significan más sincronizaciones con ML.
+
+    Los eventos salen en lotes, uno por cada estado nuevo de la vista. El
+    estado lo elige quien publica a partir de datos compartidos (digest del
+    snapshot + bucket de etiquetas), así que es el mismo en todos los
+    workers, y el ``id`` de cada evento es ``"{estado}:{i}"``. Una página
+    guarda el estado con que se renderizó; al reconectarse (a este u otro
+    worker) con ``Last-Event-ID`` recibe lo que haya después. Si el estado
+    no aparece en los últimos ``history_size`` eventos recibe un ``reset`` y
+    se resincroniza pidiendo la vista completa, sin cerrar la conexión.
+    """
+
+    def __init__(self, history_size: int = 200, queue_size: int = 500):
+        self.state = ""
+        self.queue_size = queue_size
+        # (id, estado, evento); evento None marca un estado al que se llegó sin eventos
+        self._history: deque[tuple[str, str, dict | None]] = deque(maxlen=history_size)
+        self._subscribers: set[asyncio.Queue] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_batch(self, state: str, events: list[dict]) -> None:
+        """Publica los eventos que llevan la vista al estado ``state``.
+
+        Un lote vacío también queda en la historia (como marca del estado)
+        para que quien se reconecte desde ese estado no reciba un reset.
+        """
+        if not events:
+            if state != self.state:
+                self._history.append((state, state, None))
+            self.state = state
+            return
+        self.state = state
+        for i, event in enumerate(events):
+            event_id = f"{state}:{i}"
+            self._history.append((event_id, state, event))
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait((event_id, event))
+                except asyncio.QueueFull:
+                    # Cliente que no lee: se le desconecta en vez de crecer sin
+                    # límite; al vaciar su cola recibe un reset (ver is_subscribed)
+                    self._subscribers.discard(queue)
+
+    def subscribe(self, last_event_id: str | None = None, current_state: str = "") -> asyncio.Queue:
+        """Suscribe una conexión; ``current_state`` es el estado que verían
+        quienes rendericen la página ahora (puede ir adelante del hub)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id:
+            for event_id, event in self._missed_since(last_event_id, current_state):
+                queue.put_nowait((event_id, event))
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def is_subscribed(self, queue: asyncio.Queue) -> bool:
+        return queue in self._subscribers
+
+    def reset_event(self, current_state: str = "") -> tuple[str, dict]:
+        return current_state or self.state, {"type": "reset"}
+
+    def _missed_since(self, last_event_id: str, current_state: str) -> list[tuple[str, dict]]:
+        state, sep, _ = last_event_id.partition(":")
+        if not sep and state in (self.state, current_state):
+            return []
+        # Posición del último evento que el cliente ya refleja: el id exacto,
+        # o el final del lote de su estado si sólo manda el estado
+        position = None
+        for i, (event_id, event_state, _) in enumerate(self._history):
+            if event_id == last_event_id or (not sep and event_state == state):
+                position = i
+        if position is None:
+            return [self.reset_event(current_state)]
+        return [
+            (event_id, event) for event_id, _, event in list(self._history)[position + 1:] if event is not None
+        ]
+
+
+def sse_message(event_id: str, event: dict) -> str:
+    """Formato text/event-stream de un evento."""
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+# Instancia global
+live_hub = LiveHub()
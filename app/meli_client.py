@@ -1,6 +1,7 @@
 import httpx
 import logging
 from app.config import settings
+from app.state import state_backend
 
 logger = logging.getLogger(__name__)
 
@@ -8,17 +9,25 @@ logger = logging.getLogger(__name__)
 class MeliClient:
     BASE_URL = "https://api.mercadolibre.com"
 
-    def __init__(self):
-        self.token = settings.ACCESS_TOKEN
+    @property
+    def token(self) -> str:
+        """Access token vigente, leído del backend de estado compartido."""
+        return state_backend.get_tokens()[0]
 
-    def _headers(self):
-        return {"Authorization": f"Bearer {self.token}"}
+    def _headers(self, token: str | None = None):
+        return {"Authorization": f"Bearer {token or self.token}"}
 
     async def _get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
         """GET con retry automático si el token expiró (401)."""
-        r = await client.get(url, headers=self._headers(), **kwargs)
-        if r.status_code == 401 and settings.REFRESH_TOKEN:
-            await self.refresh_access_token()
+        token = self.token
+        r = await client.get(url, headers=self._headers(token), **kwargs)
+        if r.status_code == 401:
+            # Si otro worker ya renovó el token, basta con reintentar con el
+            # nuevo: el refresh_token de ML es de un solo uso.
+            if self.token == token:
+                if not state_backend.get_tokens()[1]:
+                    return r
+                await self.refresh_access_token()
             r = await client.get(url, headers=self._headers(), **kwargs)
         return r
 
@@ -69,6 +78,27 @@ class MeliClient:
                     break
         return {"results": all_results}
 
+    async def search_orders(self, offset: int = 0, limit: int = 50, date_from: str | None = None) -> dict:
+        """Una página de órdenes pagadas del vendedor, de la más vieja a la más nueva.
+
+        Con el orden ascendente, la ``date_created`` de la última orden vista
+        sirve como cursor (``date_from``) aunque entren órdenes nuevas o
+        salgan del filtro otras ya vistas.
+        """
+        params = {
+            "seller": settings.USER_ID,
+            "order.status": "paid",
+            "sort": "date_asc",
+            "limit": limit,
+            "offset": offset,
+        }
+        if date_from:
+            params["order.date_created.from"] = date_from
+        async with httpx.AsyncClient() as client:
+            r = await self._get(client, f"{self.BASE_URL}/orders/search", params=params)
+            r.raise_for_status()
+            return r.json()
+
     async def get_items_thumbnails(
         self,
         item_variation_pairs: list[tuple[str, str | None]],
@@ -175,8 +205,12 @@ class MeliClient:
                 })
 
         # Fetch thumbnails en batch por (item_id, variation_id) y adjuntarlos
-        thumbnails = await self.get_items_thumbnails(all_pairs)
-        for entry in enriched:
+        await self._attach_thumbnails(enriched, all_pairs)
+        return enriched
+
+    async def _attach_thumbnails(self, entries: list[dict], pairs: list[tuple[str, str | None]]) -> None:
+        thumbnails = await self.get_items_thumbnails(pairs)
+        for entry in entries:
             for oi in entry["order"].get("order_items", []):
                 item_obj = oi.get("item")
                 if isinstance(item_obj, dict):
@@ -184,9 +218,37 @@ class MeliClient:
                     variation_id = str(item_obj.get("variation_id", "") or "") or None
                     item_obj["thumbnail"] = thumbnails.get((item_id, variation_id), "")
 
-        return enriched
+    async def get_order_entry(self, order_id: str, shipment: dict | None = None) -> dict:
+        """Un solo pedido con la misma forma que las entradas de get_pending_shipments().
+
+        Para cuando el pedido no está en el snapshot: 2-3 llamadas en vez de ~100.
+        """
+        order = await self.get_order(order_id)
+        shipping_id = order.get("shipping", {}).get("id")
+        if shipment is None and shipping_id:
+            try:
+                shipment = await self.get_shipment(str(shipping_id))
+            except Exception as exc:
+                logger.warning("Error al obtener shipment %s: %s", shipping_id, exc)
+        pairs = []
+        for oi in order.get("order_items", []):
+            item_id = str(oi.get("item", {}).get("id", ""))
+            if item_id:
+                pairs.append((item_id, str(oi.get("item", {}).get("variation_id", "") or "") or None))
+        entry = {"order": order, "shipment": shipment, "shipment_id": shipping_id}
+        await self._attach_thumbnails([entry], pairs)
+        return entry
+
+    async def get_shipment_entry(self, shipment_id: str) -> dict:
+        """Entrada del pedido principal de un envío que no está en el snapshot."""
+        shipment = await self.get_shipment(shipment_id)
+        order_id = shipment.get("order_id")
+        if not order_id:
+            raise ValueError(f"El envío {shipment_id} no tiene order_id")
+        return await self.get_order_entry(str(order_id), shipment=shipment)
 
     async def refresh_access_token(self) -> dict:
+        _, refresh_token = state_backend.get_tokens()
         async with httpx.AsyncClient() as client:
             r = await client.post(
                 f"{self.BASE_URL}/oauth/token",
@@ -194,14 +256,12 @@ class MeliClient:
                     "grant_type": "refresh_token",
                     "client_id": settings.APP_ID,
                     "client_secret": settings.CLIENT_SECRET,
-                    "refresh_token": settings.REFRESH_TOKEN,
+                    "refresh_token": refresh_token,
                 },
             )
             r.raise_for_status()
             tokens = r.json()
-            settings.ACCESS_TOKEN = tokens["access_token"]
-            settings.REFRESH_TOKEN = tokens["refresh_token"]
-            self.token = tokens["access_token"]
+            state_backend.set_tokens(tokens["access_token"], tokens.get("refresh_token", refresh_token))
             return tokens
 
 
@@ -15,6 +15,7 @@ class OrderItem(BaseModel):
     title: str
     quantity: int
     sku: str | None = None
+    album: str = ""
 
 
 class Order(BaseModel):
@@ -26,6 +27,7 @@ class Order(BaseModel):
     shipping_deadline: datetime | None = None
     status: str = "pending"
     date_created: datetime
+    last_updated: datetime | None = None
     total_amount: float
 
     def is_completed(self) -> bool:
@@ -46,3 +48,10 @@ class NotificationMessage(BaseModel):
     title: str
     body: str
     priority: ShippingPriority = ShippingPriority.NORMAL
+
+
+class PushSubscription(BaseModel):
+    """Suscripción Web Push tal como la entrega ``pushManager.subscribe()``."""
+    endpoint: str
+    keys: dict[str, str]
+    expirationTime: float | None = None
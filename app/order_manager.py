@@ -1,6 +1,39 @@
 import asyncio
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
 from datetime import datetime, timezone
+from typing import Callable
+from app.config import settings
 from app.models import Order, ShippingPriority
+from app.sales_counters import SalesCounters, parse_windows
+from app.state import StateBackend, state_backend
+
+PRIORITY_WEIGHT = {
+    ShippingPriority.URGENT: 0,
+    ShippingPriority.HIGH: 1,
+    ShippingPriority.NORMAL: 2,
+    ShippingPriority.FULFILLED: 3,
+}
+
+_NO_DEADLINE = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def _is_pending(order: Order | None) -> bool:
+    return order is not None and not order.is_completed()
+
+
+def _deadline_key(order: Order) -> tuple:
+    return (order.shipping_deadline or _NO_DEADLINE, order.order_id)
+
+
+def _pack_key(order: Order) -> tuple:
+    return (
+        PRIORITY_WEIGHT.get(order.shipping_priority, 2),
+        order.shipping_deadline or _NO_DEADLINE,
+        order.order_id,
+    )
 
 
 class OrderManager:
@@ -8,19 +41,262 @@ class OrderManager:
 
     Thread-safe: usa asyncio.Lock para proteger el dict de órdenes frente
     a accesos concurrentes desde múltiples coroutines.
+
+    El dict ``orders`` es una réplica local del backend de estado. Con un
+    backend compartido (SQLite) cada lectura compara la versión local con la
+    del backend y, si otro worker escribió, aplica los eventos de la bitácora
+    de cambios (o recarga todo si ya no están). Las escrituras propias se
+    aplican por el mismo camino y bajo el mismo lock (``_commit``), así que
+    un lector del threadpool nunca aplica dos veces un cambio.
+
+    Cada mutación recibe una versión monótona y deja un evento ("added",
+    "updated", "removed" o "priority_changed") consultable con
+    ``changes_since``.
+
+    Además mantiene agregados incrementales de las órdenes pendientes (lista
+    de empaque en orden de prioridad y unidades por producto) que se
+    actualizan en cada alta/baja, para que las lecturas cuesten lo que mide
+    su resultado y no el total de órdenes.
+
+    ``pending_version`` es la versión del último cambio que tocó las órdenes
+    pendientes (alta, baja o cambio de una orden no completada); con
+    ``wait_for_pending_change`` una petición puede esperar el siguiente en
+    vez de consultar cada pocos segundos.
+
+    ``sales`` lleva las unidades vendidas por producto y SKU en ventanas
+    deslizantes (``SALES_WINDOWS``); a diferencia de los agregados de
+    pendientes no se reinicia al recargar ni pierde las órdenes que expiran.
+
+    Un índice de las pendientes por fecha límite permite armar las olas de
+    picking (``get_pick_waves``) recorriendo sólo las que vencen antes del
+    corte.
+
+    Una orden que llega a estado terminal (entregada/cancelada) entra a un
+    heap de expiración y se elimina al vencer su periodo de gracia con
+    ``evict_expired``, sin recorrer el resto de las órdenes.
     """
 
-    def __init__(self):
-        self.orders: dict[int, Order] = {}
+    # Cada cuánto revisa el backend quien espera un cambio de pendientes
+    SYNC_POLL_SECONDS = 1.0
+
+    def __init__(self, backend: StateBackend | None = None, grace_seconds: float | None = None):
+        self.backend = backend or state_backend
+        self.grace_seconds = settings.COMPLETED_GRACE_SECONDS if grace_seconds is None else grace_seconds
         self._lock = asyncio.Lock()
+        self._sync_lock = threading.Lock()
+        # Se reemplaza en cada cambio de pendientes: despierta a quien espera.
+        # _loop es el event loop de quienes esperan (el Event no es thread-safe)
+        self._pending_changed = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.sales = SalesCounters(parse_windows(settings.SALES_WINDOWS), settings.SALES_WINDOW_BUCKETS)
+        self._reload()
+
+    # ── Agregados ────────────────────────────────────────────────────────────
+
+    def _index(self, order: Order) -> None:
+        self.sales.record(order)
+        if order.is_completed():
+            heapq.heappush(self._expiry, (time.time() + self.grace_seconds, order.order_id))
+            return
+        insort(self._pack_keys, _pack_key(order))
+        insort(self._deadline_keys, _deadline_key(order))
+        self._pack_lines[order.order_id] = [
+            {
+                "order_id": order.order_id,
+                "priority": order.shipping_priority,
+                "deadline": order.shipping_deadline,
+                "item_id": item.item_id,
+                "title": item.title,
+                "quantity": item.quantity,
+                "sku": item.sku,
+                "album": item.album,
+            }
+            for item in order.items
+        ]
+        for item in order.items:
+            product = self._item_totals.get(item.item_id)
+            if product is None:
+                product = self._item_totals[item.item_id] = {
+                    "item_id": item.item_id,
+                    "title": item.title,
+                    "sku": item.sku,
+                    "total_sold": 0,
+                }
+            product["total_sold"] += item.quantity
+            self._total_units += item.quantity
+        self._products_sorted = None
+
+    def _unindex(self, order: Order) -> None:
+        if order.order_id not in self._pack_lines:
+            return
+        for keys, key in ((self._pack_keys, _pack_key(order)), (self._deadline_keys, _deadline_key(order))):
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        del self._pack_lines[order.order_id]
+        for item in order.items:
+            product = self._item_totals.get(item.item_id)
+            if product is None:
+                continue
+            product["total_sold"] -= item.quantity
+            if product["total_sold"] <= 0:
+                del self._item_totals[item.item_id]
+            self._total_units -= item.quantity
+        self._products_sorted = None
+
+    def _reload(self) -> None:
+        self._version, self.orders = self.backend.load_orders()
+        # Sin bitácora no se sabe qué cambió: se asume que las pendientes sí
+        self._pending_version = self._version
+        self._pack_keys: list[tuple] = []
+        self._deadline_keys: list[tuple] = []
+        self._pack_lines: dict[int, list[dict]] = {}
+        self._item_totals: dict[str, dict] = {}
+        self._products_sorted: list[dict] | None = None
+        self._total_units = 0
+        self._expiry: list[tuple[float, int]] = []
+        for order in self.orders.values():
+            self._index(order)
+
+    # ── Sincronización con el backend ────────────────────────────────────────
+
+    def _replay(self) -> None:
+        """Pone la réplica al día con los eventos del backend. Llamar con _sync_lock."""
+        changes = self.backend.changes_since(self._version)
+        if changes is None:
+            self._reload()
+            return
+        for change in changes:
+            # Primero los índices y luego el dict: los lectores del threadpool
+            # nunca ven una llave de índice sin su orden
+            previous = self.orders.get(change["order_id"])
+            if previous is not None:
+                self._unindex(previous)
+            if change["order"] is not None:
+                self.orders[change["order_id"]] = change["order"]
+                self._index(change["order"])
+            else:
+                self.orders.pop(change["order_id"], None)
+            self._version = change["version"]
+            if _is_pending(previous) or _is_pending(change["order"]):
+                self._mark_pending_changed(change["version"])
+
+    def _mark_pending_changed(self, version: int) -> None:
+        """Despierta a quien espera un cambio de pendientes.
+
+        Puede llamarse desde el threadpool (``_sync`` de un endpoint
+        síncrono): en ese caso el ``set()`` se agenda en el loop.
+        """
+        self._pending_version = version
+        event, self._pending_changed = self._pending_changed, asyncio.Event()
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nadie ha esperado todavía
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    def _sync(self) -> None:
+        """Aplica los cambios que otro worker haya escrito en el backend."""
+        if self.backend.version() == self._version:
+            return
+        with self._sync_lock:
+            if self.backend.version() != self._version:
+                self._replay()
+
+    def _commit(self, write: Callable[[], int]) -> None:
+        """Escribe en el backend y aplica el cambio a la réplica.
+
+        La escritura y su aplicación van bajo ``_sync_lock``, y el cambio
+        propio se aplica con ``_replay`` como los de otros workers: un
+        ``_sync`` del threadpool que vea la versión nueva espera el lock y ya
+        la encuentra aplicada, en vez de aplicarla otra vez.
+        """
+        with self._sync_lock:
+            write()
+            self._replay()
+
+    # ── Escrituras ───────────────────────────────────────────────────────────
 
     async def add_order(self, order: Order) -> None:
         async with self._lock:
-            self.orders[order.order_id] = order
+            self._sync()
+            previous = self.orders.get(order.order_id)
+            if previous is None:
+                change_type = "added"
+            elif previous.shipping_priority != order.shipping_priority:
+                change_type = "priority_changed"
+            else:
+                change_type = "updated"
+            self._commit(lambda: self.backend.put_order(order, change_type))
 
     async def remove_order(self, order_id: int) -> None:
         async with self._lock:
-            self.orders.pop(order_id, None)
+            self._commit(lambda: self.backend.delete_order(order_id))
+
+    async def evict_expired(self, force: bool = False) -> list[int]:
+        """Elimina las órdenes completadas cuyo periodo de gracia venció.
+
+        Con ``force`` elimina todas las completadas sin esperar. Sólo toca las
+        entradas vencidas del heap, no el resto de las órdenes.
+        """
+        async with self._lock:
+            self._sync()
+            now = time.time()
+            removed = []
+            while self._expiry and (force or self._expiry[0][0] <= now):
+                _, order_id = heapq.heappop(self._expiry)
+                order = self.orders.get(order_id)
+                # La entrada puede ser vieja: la orden se actualizó o ya se fue
+                if order is None or not order.is_completed():
+                    continue
+                self._commit(lambda: self.backend.delete_order(order_id))
+                removed.append(order_id)
+            return removed
+
+    # ── Lecturas ─────────────────────────────────────────────────────────────
+
+    @property
+    def version(self) -> int:
+        self._sync()
+        return self._version
+
+    @property
+    def pending_version(self) -> int:
+        self._sync()
+        return self._pending_version
+
+    async def wait_for_pending_change(self, since: int, timeout: float) -> bool:
+        """Espera hasta que las órdenes pendientes cambien después de ``since``.
+
+        Regresa True si cambiaron, False si se venció ``timeout``. Los cambios
+        de este proceso despiertan al instante; los de otro worker (backend
+        compartido) se ven al revisar el backend cada ``SYNC_POLL_SECONDS``.
+        """
+        self._loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while self.pending_version <= since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._pending_changed.wait(), min(remaining, self.SYNC_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def changes_since(self, version: int) -> list[dict] | None:
+        """Eventos posteriores a ``version``; None si el cliente debe recargar todo."""
+        return self.backend.changes_since(version)
+
+    def get_order(self, order_id: int) -> Order | None:
+        self._sync()
+        return self.orders.get(order_id)
 
     def get_sorted_orders(self) -> list[Order]:
         """Regresa las órdenes pendientes ordenadas por prioridad de envío.
@@ -28,34 +304,87 @@ class OrderManager:
         Nota: lectura no bloqueante; la consistencia es eventual pero suficiente
         para dashboards de sólo lectura.
         """
-        priority_weight = {
-            ShippingPriority.URGENT: 0,
-            ShippingPriority.HIGH: 1,
-            ShippingPriority.NORMAL: 2,
-            ShippingPriority.FULFILLED: 3,
+        self._sync()
+        return [self.orders[key[-1]] for key in self._pack_keys]
+
+    def get_pack_list(self) -> list[dict]:
+        """Una línea por artículo pendiente, en orden de prioridad de envío."""
+        self._sync()
+        lines = []
+        for key in self._pack_keys:
+            lines.extend(self._pack_lines[key[-1]])
+        return lines
+
+    def get_pick_waves(self, cutoff: datetime, by: str = "sku") -> dict:
+        """Artículos pendientes con fecha límite antes de ``cutoff``, agrupados.
+
+        Una ola por SKU (``by="sku"``) o por álbum (``by="album"``); los
+        artículos sin ese dato se agrupan por item_id. Cada ola suma las
+        unidades y lista las órdenes que la componen. Las olas salen por la
+        fecha límite más próxima y, a igual fecha, por más unidades.
+        """
+        self._sync()
+        end = bisect_left(self._deadline_keys, (cutoff,))
+        waves: dict[str, dict] = {}
+        for deadline, order_id in self._deadline_keys[:end]:
+            for line in self._pack_lines[order_id]:
+                key = line[by] or f"item:{line['item_id']}"
+                wave = waves.get(key)
+                if wave is None:
+                    wave = waves[key] = {
+                        "key": key,
+                        "title": line["title"],
+                        "sku": line["sku"],
+                        "album": line["album"],
+                        "quantity": 0,
+                        "earliest_deadline": deadline,
+                        "orders": [],
+                    }
+                wave["quantity"] += line["quantity"]
+                # Las órdenes llegan por fecha límite: la primera es la más próxima
+                wave["orders"].append({"order_id": order_id, "quantity": line["quantity"], "deadline": deadline})
+        return {
+            "group_by": by,
+            "cutoff": cutoff,
+            "orders": end,
+            "waves": sorted(waves.values(), key=lambda w: (w["earliest_deadline"], -w["quantity"])),
         }
-        pending = [o for o in self.orders.values() if not o.is_completed()]
-        return sorted(pending, key=lambda o: (
-            priority_weight.get(o.shipping_priority, 2),
-            o.shipping_deadline or datetime.max.replace(tzinfo=timezone.utc),
-        ))
-
-    async def cleanup_completed(self) -> list[int]:
-        """Elimina órdenes completadas (entregadas o canceladas). Retorna IDs eliminados."""
-        async with self._lock:
-            to_remove = [oid for oid, o in self.orders.items() if o.is_completed()]
-            for oid in to_remove:
-                del self.orders[oid]
-            return to_remove
+
+    def get_product_totals(self) -> list[dict]:
+        """Unidades pendientes por producto, de mayor a menor.
+
+        Regresa copias: los dicts internos se siguen actualizando con cada orden.
+        """
+        self._sync()
+        if self._products_sorted is None:
+            self._products_sorted = sorted(
+                self._item_totals.values(),
+                key=lambda p: p["total_sold"],
+                reverse=True,
+            )
+        return [dict(product) for product in self._products_sorted]
+
+    def get_sales_velocity(self, by: str = "item") -> list[dict]:
+        """Unidades vendidas por producto o SKU en cada ventana de ``SALES_WINDOWS``."""
+        self._sync()
+        return self.sales.velocity(by)
+
+    def get_total_units(self) -> int:
+        self._sync()
+        return self._total_units
 
     def get_pending_count(self) -> int:
-        return sum(1 for o in self.orders.values() if not o.is_completed())
+        self._sync()
+        return len(self._pack_keys)
 
     def get_urgent_orders(self) -> list[Order]:
-        return [
-            o for o in self.orders.values()
-            if o.shipping_priority == ShippingPriority.URGENT and not o.is_completed()
-        ]
+        self._sync()
+        urgent = []
+        for key in self._pack_keys:
+            if key[0] != PRIORITY_WEIGHT[ShippingPriority.URGENT]:
+                break
+            urgent.append(self.orders[key[-1]])
+        return urgent
 
 
 # Instancia global
@@ -0,0 +1,104 @@
+"""Alta de órdenes de ML en OrderManager.
+
+Lo comparten el webhook (``/webhooks/receive``) y la reconciliación: los dos
+convierten la orden de la API con ``build_order`` y la guardan con
+``store_order``, con las mismas reglas.
+"""
+from datetime import datetime, timezone
+from app.meli_client import meli
+from app.models import Order, OrderItem, ShippingPriority
+from app.order_manager import order_manager
+from app.push import push_dispatcher
+
+
+def extract_album(order_item: dict) -> str:
+    """Extrae el nombre del álbum desde variation_attributes del order_item."""
+    attrs = order_item.get("item", {}).get("variation_attributes") or []
+    for attr in attrs:
+        name = (attr.get("name") or "").lower()
+        if "lbum" in name or "versi" in name:
+            return attr.get("value_name") or ""
+    return ""
+
+
+def classify_shipping_priority(shipment: dict) -> ShippingPriority:
+    """Clasifica la prioridad según el tipo de envío y fecha límite."""
+    status = shipment.get("status", "")
+    if status in ("delivered", "cancelled"):
+        return ShippingPriority.FULFILLED
+
+    shipping_type = shipment.get("logistic_type", "")
+    # Fulfillment o same-day = urgente
+    if shipping_type in ("fulfillment", "same_day", "next_day"):
+        return ShippingPriority.URGENT
+
+    # Revisar fecha límite de despacho
+    deadline = shipment.get("shipping_option", {}).get("estimated_handling_limit", {}).get("date")
+    if deadline:
+        deadline_dt = datetime.fromisoformat(deadline.replace("Z", "+00:00"))
+        now = datetime.now(timezone.utc)
+        hours_left = (deadline_dt - now).total_seconds() / 3600
+        if hours_left <= 24:
+            return ShippingPriority.URGENT
+        elif hours_left <= 48:
+            return ShippingPriority.HIGH
+
+    return ShippingPriority.NORMAL
+
+
+async def build_order(order_data: dict) -> Order:
+    """Convierte una orden de la API de ML en Order, consultando su envío."""
+    shipping_id = order_data.get("shipping", {}).get("id")
+    priority = ShippingPriority.NORMAL
+    deadline = None
+
+    if shipping_id:
+        shipment = await meli.get_shipment(str(shipping_id))
+        priority = classify_shipping_priority(shipment)
+        dl = shipment.get("shipping_option", {}).get(
+            "estimated_handling_limit", {}
+        ).get("date")
+        if dl:
+            deadline = datetime.fromisoformat(dl.replace("Z", "+00:00"))
+
+    items = [
+        OrderItem(
+            item_id=item["item"]["id"],
+            title=item["item"]["title"],
+            quantity=item["quantity"],
+            sku=item["item"].get("seller_sku"),
+            album=extract_album(item),
+        )
+        for item in order_data.get("order_items", [])
+    ]
+
+    return Order(
+        order_id=int(order_data["id"]),
+        buyer_nickname=order_data.get("buyer", {}).get("nickname", ""),
+        items=items,
+        shipping_id=shipping_id,
+        shipping_priority=priority,
+        shipping_deadline=deadline,
+        status=order_data.get("status", "pending"),
+        date_created=order_data.get("date_created", datetime.now(timezone.utc).isoformat()),
+        last_updated=order_data.get("last_updated"),
+        total_amount=order_data.get("total_amount", 0),
+    )
+
+
+async def store_order(order: Order) -> None:
+    """Guarda la orden en OrderManager.
+
+    Si ya está completada, OrderManager la programa para expirar; una
+    completada que nunca tuvimos no hace falta registrarla.
+    """
+    previous = order_manager.get_order(order.order_id)
+    if not order.is_completed() or previous:
+        await order_manager.add_order(order)
+
+    # Aviso push sólo en la transición a urgente, no en cada webhook
+    if order.shipping_priority == ShippingPriority.URGENT and (
+        previous is None or previous.shipping_priority != ShippingPriority.URGENT
+    ):
+        items = ", ".join(f"{item.title} x{item.quantity}" for item in order.items)
+        push_dispatcher.notify(order.order_id, "urgent", f"#{order.order_id} {items}")
@@ -0,0 +1,308 @@
+"""Notificaciones push salientes cuando un pedido se vuelve urgente o demorado.
+
+Quien detecta el cambio llama ``push_dispatcher.notify(...)``: el webhook
+(pedido urgente) y el refresco del snapshot de /ventas/ (pedido demorado).
+
+- Dedupe: cada (pedido, tipo) se avisa una sola vez por ``dedupe_seconds``,
+  también entre workers (``claim_once`` del backend de estado).
+- Batching: los avisos se juntan ``batch_seconds`` y salen como un solo
+  mensaje por canal.
+- Rate limit por canal: entre dos envíos de un canal pasan al menos
+  ``min_interval`` segundos; lo que llegue mientras tanto sale en el
+  siguiente lote. Si un envío falla se reintenta con backoff.
+- Métricas por canal: envíos, fallas y latencia desde que se detectó el
+  evento hasta que el transporte confirmó la entrega.
+
+Transportes: POST HTTP genérico (``PUSH_HTTP_URL``, ver
+``scripts/push_receiver.py``) y Web Push (``VAPID_PRIVATE_KEY``, requiere
+el paquete opcional ``pywebpush``).
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+import httpx
+from app.config import settings
+from app.state import StateBackend, state_backend
+
+try:
+    from pywebpush import WebPushException, webpush
+except ImportError:  # pywebpush es opcional: sin él no hay canal Web Push
+    webpush = None
+
+logger = logging.getLogger(__name__)
+
+# Reintentos de un lote que falló antes de descartarlo
+MAX_RETRIES = 3
+# Líneas de pedidos en el cuerpo de un mensaje
+MAX_BODY_LINES = 8
+
+KIND_TITLES = {
+    "delayed": "⚠️ {n} demorado(s)",
+    "urgent": "🚚 {n} urgente(s)",
+    "test": "🔔 Prueba",
+}
+
+
+@dataclass
+class PushEvent:
+    order_id: str
+    kind: str
+    text: str
+    created_at: float = field(default_factory=time.time)
+
+
+def build_message(events: list[PushEvent]) -> dict:
+    """Un mensaje para un lote de eventos (título con conteos, una línea por pedido)."""
+    counts: dict[str, int] = {}
+    for event in events:
+        counts[event.kind] = counts.get(event.kind, 0) + 1
+    title = " · ".join(KIND_TITLES.get(kind, kind).format(n=n) for kind, n in counts.items())
+    lines = [f"- {event.text}" for event in events[:MAX_BODY_LINES]]
+    if len(events) > MAX_BODY_LINES:
+        lines.append(f"… y {len(events) - MAX_BODY_LINES} más")
+    return {
+        "title": title,
+        "body": "\n".join(lines),
+        "events": [
+            {"order_id": e.order_id, "kind": e.kind, "created_at": e.created_at} for e in events
+        ],
+        "sent_at": time.time(),
+    }
+
+
+class PushTransport:
+    name = "base"
+
+    async def send(self, message: dict) -> None:
+        raise NotImplementedError
+
+
+class HttpPostTransport(PushTransport):
+    """POST del mensaje como JSON a una URL (ntfy, un bot, scripts/push_receiver.py…)."""
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, message: dict) -> None:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            r = await client.post(self.url, json=message)
+            r.raise_for_status()
+
+
+class WebPushTransport(PushTransport):
+    """Web Push (VAPID) a los navegadores suscritos desde /notificaciones/.
+
+    Las suscripciones viven en el backend de estado: un navegador que se
+    suscribe en un worker recibe los avisos que envíe cualquier otro.
+    """
+
+    name = "webpush"
+
+    def __init__(self, private_key: str, subject: str, backend: StateBackend):
+        self.private_key = private_key
+        self.subject = subject
+        self.backend = backend
+
+    @property
+    def subscriptions(self) -> list[dict]:
+        return self.backend.push_subscriptions()
+
+    def subscribe(self, subscription: dict) -> None:
+        self.backend.put_push_subscription(subscription)
+
+    def unsubscribe(self, endpoint: str) -> None:
+        self.backend.delete_push_subscription(endpoint)
+
+    async def send(self, message: dict) -> None:
+        subscriptions = self.subscriptions
+        if not subscriptions:
+            return
+        payload = json.dumps({"title": message["title"], "body": message["body"]})
+        failed = 0
+        for subscription in subscriptions:
+            endpoint = subscription["endpoint"]
+            try:
+                # pywebpush es síncrono (requests): fuera del event loop
+                await asyncio.to_thread(
+                    webpush,
+                    subscription_info=subscription,
+                    data=payload,
+                    vapid_private_key=self.private_key,
+                    vapid_claims={"sub": self.subject},
+                )
+            except WebPushException as exc:
+                status = getattr(exc.response, "status_code", None)
+                if status in (404, 410):
+                    # El navegador ya no existe o se dio de baja
+                    self.unsubscribe(endpoint)
+                else:
+                    failed += 1
+                    logger.warning("Web Push a %s falló: %s", endpoint[:40], exc)
+        if failed and failed == len(subscriptions):
+            raise RuntimeError(f"Web Push falló para las {failed} suscripciones")
+
+
+class PushChannel:
+    """Un transporte con su cola pendiente, rate limit y métricas."""
+
+    def __init__(self, transport: PushTransport, min_interval: float):
+        self.transport = transport
+        self.min_interval = min_interval
+        self.pending: dict[tuple[str, str], PushEvent] = {}
+        self.next_allowed = 0.0
+        self.retries = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.last_error: str | None = None
+        self.latencies: deque[float] = deque(maxlen=500)
+        self.task: asyncio.Task | None = None
+
+    def status(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> float | None:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3) if ordered else None
+
+        return {
+            "pending": len(self.pending),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "last_error": self.last_error,
+            "latency_seconds": {"p50": pct(0.5), "p95": pct(0.95), "max": round(ordered[-1], 3) if ordered else None},
+        }
+
+
+class PushDispatcher:
+    def __init__(self, batch_seconds: float, dedupe_seconds: float, backend: StateBackend):
+        self.batch_seconds = batch_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.backend = backend
+        self.channels: dict[str, PushChannel] = {}
+        self.received = 0
+        self.deduped = 0
+
+    def add_transport(self, transport: PushTransport, min_interval: float) -> None:
+        self.channels[transport.name] = PushChannel(transport, min_interval)
+
+    def notify(self, order_id, kind: str, text: str) -> None:
+        """Encola un aviso; se ignora si ese (pedido, tipo) ya se avisó hace poco."""
+        if not self.channels:
+            return
+        key = (str(order_id), kind)
+        self.received += 1
+        if not self.backend.claim_once(f"push:{key[0]}:{kind}", self.dedupe_seconds):
+            self.deduped += 1
+            return
+        event = PushEvent(order_id=str(order_id), kind=kind, text=text)
+        for channel in self.channels.values():
+            channel.pending[key] = event
+            if channel.task is None:
+                channel.task = asyncio.create_task(self._drain(channel))
+            # si no, ya hay un envío programado y el evento va en ese lote
+
+    async def _drain(self, channel: PushChannel) -> None:
+        """Envía lotes mientras haya pendientes, respetando el rate limit.
+
+        ``channel.task`` se suelta sólo cuando la cola quedó vacía (sin un
+        ``await`` de por medio): mientras un envío está en curso, lo que
+        llegue espera al siguiente lote en vez de abrir un envío paralelo.
+        """
+        try:
+            while True:
+                delay = self.batch_seconds
+                wait = channel.next_allowed - time.time()
+                if wait > delay:
+                    channel.rate_limited += 1
+                    delay = wait
+                await asyncio.sleep(delay)
+                if not channel.pending:
+                    return
+                await self._flush(channel)
+        finally:
+            channel.task = None
+
+    async def _flush(self, channel: PushChannel) -> None:
+        events = list(channel.pending.values())
+        channel.pending.clear()
+        if not events:
+            return
+        try:
+            await channel.transport.send(build_message(events))
+        except Exception as exc:
+            channel.failed += 1
+            channel.last_error = str(exc)
+            channel.retries += 1
+            if channel.retries > MAX_RETRIES:
+                logger.warning("Push por %s descartado tras %d intentos: %s", channel.transport.name, MAX_RETRIES, exc)
+                channel.dropped += len(events)
+                channel.retries = 0
+            else:
+                # Devolver el lote a la cola (sin pisar eventos más nuevos) y esperar
+                for event in events:
+                    channel.pending.setdefault((event.order_id, event.kind), event)
+                channel.next_allowed = time.time() + min(300, 5 * 2 ** channel.retries)
+            return
+
+        done = time.time()
+        channel.sent += 1
+        channel.retries = 0
+        channel.next_allowed = done + channel.min_interval
+        channel.latencies.extend(done - event.created_at for event in events)
+
+    async def stop(self) -> None:
+        for channel in self.channels.values():
+            if channel.task is not None:
+                channel.task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "received": self.received,
+            "deduped": self.deduped,
+            "channels": {name: channel.status() for name, channel in self.channels.items()},
+        }
+
+
+def create_dispatcher() -> PushDispatcher:
+    dispatcher = PushDispatcher(
+        batch_seconds=settings.PUSH_BATCH_SECONDS,
+        dedupe_seconds=settings.PUSH_DEDUPE_SECONDS,
+        backend=state_backend,
+    )
+    if settings.PUSH_HTTP_URL:
+        dispatcher.add_transport(HttpPostTransport(settings.PUSH_HTTP_URL), settings.PUSH_MIN_INTERVAL_SECONDS)
+    if settings.VAPID_PRIVATE_KEY:
+        if webpush is None:
+            logger.warning("VAPID_PRIVATE_KEY configurado pero falta el paquete pywebpush")
+        else:
+            dispatcher.add_transport(
+                WebPushTransport(settings.VAPID_PRIVATE_KEY, settings.VAPID_SUBJECT, state_backend),
+                settings.PUSH_MIN_INTERVAL_SECONDS,
+            )
+    return dispatcher
+
+
+# Instancia global
+push_dispatcher = create_dispatcher()
+
+
+# Service worker para Web Push: muestra la notificación y abre /ventas/ al tocarla
+SERVICE_WORKER_JS = """
+self.addEventListener('push', function(event) {
+    const data = event.data ? event.data.json() : {title: 'ML Gestión', body: ''};
+    event.waitUntil(self.registration.showNotification(data.title, {body: data.body, tag: 'ml-pedidos'}));
+});
+self.addEventListener('notificationclick', function(event) {
+    event.notification.close();
+    event.waitUntil(clients.openWindow('/ventas/'));
+});
+"""
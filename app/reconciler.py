@@ -0,0 +1,160 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.meli_client import meli
+from app.order_manager import order_manager
+from app.order_sync import build_order, store_order
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(date_str: str | None) -> datetime | None:
+    if not date_str:
+        return None
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+class Reconciler:
+    """Cura las divergencias entre OrderManager y ML si se perdió un webhook.
+
+    Cada corrida recorre unas cuantas páginas de /orders/search (órdenes
+    pagadas de los últimos ``lookback_days``) a partir de un cursor que se
+    conserva entre corridas, y compara ``last_updated`` contra la copia en
+    memoria. Sólo las órdenes que difieren se reconstruyen (lo que implica
+    pedir su envío). Al terminar un ciclo completo, las órdenes locales
+    creadas dentro de la ventana que ya no aparecieron en la búsqueda se
+    vuelven a consultar una por una; las más viejas que la ventana no
+    pueden aparecer en ella y las mantienen al día los webhooks.
+
+    El cursor es la ``date_created`` de la última orden vista (más cuántas
+    con esa misma fecha ya se procesaron), no un offset global: si una orden
+    sale del filtro "paid" entre páginas, las siguientes no se recorren.
+
+    Las órdenes ya entregadas o canceladas no se guardan localmente; para no
+    reconstruirlas en cada ciclo se recuerda su ``last_updated`` y sólo se
+    vuelven a revisar si cambia.
+    """
+
+    def __init__(self, pages_per_run: int = 2, page_size: int = 50, lookback_days: int = 14):
+        self.pages_per_run = pages_per_run
+        self.page_size = page_size
+        self.lookback_days = lookback_days
+        self.cursor: str | None = None
+        # Inicio de la ventana del ciclo en curso (epoch)
+        self._cycle_since = 0.0
+        self._cursor_offset = 0
+        self._cycle_seen: set[int] = set()
+        # order_id -> last_updated de las órdenes confirmadas como terminadas
+        self._settled: dict[int, str | None] = {}
+        self.metrics = {
+            "runs": 0,
+            "cycles": 0,
+            "checked": 0,
+            "in_sync": 0,
+            "settled": 0,
+            "missing": 0,
+            "stale": 0,
+            "vanished": 0,
+            "fetched": 0,
+            "errors": 0,
+            "last_run": None,
+            "last_cycle_drift": None,
+        }
+        self._cycle_drift = 0
+
+    def status(self) -> dict:
+        return {"cursor": self.cursor, "settled_known": len(self._settled), **self.metrics}
+
+    async def _heal(self, order_data: dict) -> None:
+        try:
+            order = await build_order(order_data)
+        except Exception as exc:
+            self.metrics["errors"] += 1
+            logger.warning("Reconciliación: no se pudo reconstruir la orden %s: %s", order_data.get("id"), exc)
+            return
+        self.metrics["fetched"] += 1
+        if order.is_completed():
+            self._settled[order.order_id] = order_data.get("last_updated")
+        # Mismas reglas que el webhook: una completada que nunca tuvimos no se guarda
+        await store_order(order)
+
+    async def _finish_cycle(self) -> None:
+        for order in order_manager.get_sorted_orders():
+            if order.order_id in self._cycle_seen or order.date_created.timestamp() < self._cycle_since:
+                continue
+            self.metrics["vanished"] += 1
+            self._cycle_drift += 1
+            try:
+                order_data = await meli.get_order(str(order.order_id))
+            except Exception as exc:
+                self.metrics["errors"] += 1
+                logger.warning("Reconciliación: no se pudo consultar la orden %s: %s", order.order_id, exc)
+                continue
+            await self._heal(order_data)
+
+        # Las terminadas que ya no salen en la búsqueda no hace falta recordarlas
+        for order_id in self._settled.keys() - self._cycle_seen:
+            del self._settled[order_id]
+
+        self.metrics["cycles"] += 1
+        self.metrics["last_cycle_drift"] = self._cycle_drift
+        self._cycle_drift = 0
+        self._cycle_seen.clear()
+        self.cursor = None
+        self._cursor_offset = 0
+
+    async def run(self) -> None:
+        """Procesa hasta ``pages_per_run`` páginas desde el cursor."""
+        self.metrics["runs"] += 1
+        self.metrics["last_run"] = time.time()
+        if self.cursor is None:
+            since = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+            self._cycle_since = since.timestamp()
+            self.cursor = since.strftime("%Y-%m-%dT%H:%M:%S.000-00:00")
+            self._cursor_offset = 0
+
+        for _ in range(self.pages_per_run):
+            page = await meli.search_orders(self._cursor_offset, self.page_size, self.cursor)
+            results = page.get("results", [])
+            for order_data in results:
+                order_id = int(order_data["id"])
+                if order_id in self._cycle_seen:
+                    continue  # ya revisada en este ciclo (misma fecha que el cursor)
+                self._cycle_seen.add(order_id)
+                self.metrics["checked"] += 1
+                local = order_manager.get_order(order_id)
+                remote_updated = _parse_date(order_data.get("last_updated"))
+                if local is None:
+                    if order_id in self._settled and self._settled[order_id] == order_data.get("last_updated"):
+                        self.metrics["settled"] += 1
+                        continue
+                    self.metrics["missing"] += 1
+                elif local.last_updated != remote_updated:
+                    self.metrics["stale"] += 1
+                else:
+                    self.metrics["in_sync"] += 1
+                    continue
+                self._cycle_drift += 1
+                await self._heal(order_data)
+
+            if len(results) < self.page_size:
+                await self._finish_cycle()
+                break
+            # La búsqueda incluye la fecha del cursor: se saltan las que ya se
+            # vieron con esa misma fecha
+            last = results[-1].get("date_created")
+            if last == self.cursor:
+                self._cursor_offset += len(results)
+            else:
+                self.cursor = last
+                self._cursor_offset = sum(1 for o in results if o.get("date_created") == last)
+
+# Instancia global
+reconciler = Reconciler(
+    pages_per_run=settings.RECONCILE_PAGES_PER_RUN,
+    lookback_days=settings.RECONCILE_LOOKBACK_DAYS,
+)
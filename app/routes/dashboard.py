@@ -1,12 +1,116 @@
-from fastapi import APIRouter
-from fastapi.responses import HTMLResponse
-from app.meli_client import meli
-from app.routes.ventas import _enrich_order, _format_date_short, _build_product_html, _sort_key
-from app.ui import base_layout
+import heapq
+import threading
+import time
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+from app.snapshot import entry_version, pending_snapshot
+from app.fragment_cache import fragment_cache
+from app.http_cache import cache_headers, etag_matches, label_bucket, make_etag, not_modified
+from app.routes.ventas import _enrich_order, _format_date_short, _build_product_html, _sort_key, _time_bucket
+from app.ui import ASSETS_VERSION, DASHBOARD_JS_ASSET, base_layout
 
 router = APIRouter()
 
 
+class DashboardCounters:
+    """Contadores de las stat cards del dashboard, mantenidos por diferencias.
+
+    Guarda lo que aporta cada orden (categoría, monto). Como listener del
+    snapshot compara la versión de cada pedido (``entry_version``) contra la
+    anterior y sólo recalcula los que cambiaron, entraron o salieron.
+
+    La categoría también depende de la hora: cambia sólo cuando cambia el
+    bucket de horas al deadline (``_time_bucket``). Un heap guarda cuándo le
+    toca a cada orden y al leer se recalculan sólo las vencidas. Leerlos
+    cuesta O(órdenes cuya etiqueta cambió), no O(órdenes).
+    """
+
+    CATEGORIES = ("delayed", "ready", "shipped")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.CATEGORIES, 0)
+        self.total_amount = 0.0
+        self.orders = 0
+        self._contrib: dict[str, tuple[str, float]] = {}
+        # order_id -> (versión del pedido, entrada del snapshot)
+        self._entries: dict[str, tuple[tuple, dict]] = {}
+        # (cuándo cambia el bucket de horas, order_id, versión)
+        self._relabel: list[tuple[float, str, tuple]] = []
+        self._snapshot_version = None
+        # El listener corre en el loop; los endpoints síncronos leen desde el threadpool
+        self._lock = threading.Lock()
+
+    def _apply(self, order_id: str, new: tuple[str, float] | None) -> None:
+        old = self._contrib.pop(order_id, None)
+        if old is not None:
+            if old[0] in self.counts:
+                self.counts[old[0]] -= 1
+            self.total_amount -= old[1]
+            self.orders -= 1
+        if new is not None:
+            self._contrib[order_id] = new
+            if new[0] in self.counts:
+                self.counts[new[0]] += 1
+            self.total_amount += new[1]
+            self.orders += 1
+
+    def _update(self, order_id: str, version: tuple, item: dict) -> None:
+        """Recalcula lo que aporta una orden y agenda su próximo cambio de etiqueta."""
+        o = _enrich_order(item)  # memoizado por versión del pedido
+        new = (o["category"], o["total"])
+        if self._contrib.get(order_id) != new:
+            self._apply(order_id, new)
+        bucket = _time_bucket(o["deadline_ts"])
+        if bucket is not None:
+            heapq.heappush(self._relabel, (o["deadline_ts"] - 3600 * bucket, order_id, version))
+
+    def on_snapshot(self, data: list[dict]) -> None:
+        """Listener del snapshot: aplica sólo los pedidos que cambiaron."""
+        with self._lock:
+            if self._snapshot_version == pending_snapshot.version:
+                return
+            self._snapshot_version = pending_snapshot.version
+            seen = set()
+            for item in data:
+                shipment = item.get("shipment")
+                if shipment and shipment.get("status") in ("delivered", "cancelled"):
+                    continue
+                order_id = str(item["order"].get("id"))
+                seen.add(order_id)
+                version = entry_version(item)
+                known = self._entries.get(order_id)
+                if known is not None and known[0] == version:
+                    continue
+                self._entries[order_id] = (version, item)
+                self._update(order_id, version, item)
+            for order_id in self._entries.keys() - seen:
+                del self._entries[order_id]
+                self._apply(order_id, None)
+            if not self._contrib:
+                self.total_amount = 0.0  # sin residuos de punto flotante
+            # Las entradas del heap de órdenes que ya no están se descartan al salir
+
+    def _relabel_due(self, now: float) -> None:
+        while self._relabel and self._relabel[0][0] < now:
+            _, order_id, version = heapq.heappop(self._relabel)
+            known = self._entries.get(order_id)
+            if known is None or known[0] != version:
+                continue  # la orden cambió o salió: su entrada vigente es otra
+            self._update(order_id, version, known[1])
+
+    def snapshot(self) -> dict:
+        if self._snapshot_version != pending_snapshot.version and pending_snapshot.data is not None:
+            self.on_snapshot(pending_snapshot.data)
+        with self._lock:
+            self._relabel_due(time.time())
+            return {**self.counts, "total_amount": round(self.total_amount, 2), "orders": self.orders}
+
+
+# Instancia global
+dashboard_counters = DashboardCounters()
+pending_snapshot.add_listener(dashboard_counters.on_snapshot)
+
+
 def _build_recent_card(o: dict) -> str:
     """Card resumida de pedido para el dashboard — clickable para ver detalle."""
     is_delayed = o["category"] == "delayed"
@@ -34,7 +138,7 @@ def _build_recent_card(o: dict) -> str:
     shipment_id = o.get("shipment_id") or o["order_id"]
 
     return f"""
-    <div class="order-card" style="border-left:4px solid {border_color};"
+    <div class="order-card" data-shipment-id="{shipment_id}" style="border-left:4px solid {border_color};"
          onclick="openShipmentModal({shipment_id!r})" role="button" tabindex="0"
          onkeydown="if(event.key==='Enter')openShipmentModal({shipment_id!r})">
         <div class="order-card-header">
@@ -61,41 +165,39 @@ def _build_recent_card(o: dict) -> str:
 
 
 @router.get("/", response_class=HTMLResponse)
-async def dashboard():
+async def dashboard(request: Request, refresh: bool = False):
     """Dashboard principal con resumen general."""
-    delayed_count = 0
-    ready_count = 0
-    shipped_count = 0
-    total_amount = 0.0
     orders = []
     error_msg = ""
+    etag = None
 
     try:
-        data = await meli.get_pending_shipments()
+        data = await (pending_snapshot.refresh() if refresh else pending_snapshot.get())
+        etag = make_etag("dashboard", pending_snapshot.digest, label_bucket(), ASSETS_VERSION)
+        if not refresh and etag_matches(request, etag):
+            return not_modified(etag)
 
         for item in data:
             shipment = item.get("shipment")
             if shipment and shipment.get("status") in ("delivered", "cancelled"):
                 continue
-            enriched = _enrich_order(item)
-            orders.append(enriched)
-            total_amount += enriched["total"]
-
-            cat = enriched["category"]
-            if cat == "delayed":
-                delayed_count += 1
-            elif cat == "ready":
-                ready_count += 1
-            elif cat == "shipped":
-                shipped_count += 1
-
-        orders.sort(key=_sort_key)
+            orders.append(_enrich_order(item))
     except Exception as e:
         error_msg = str(e)
+        etag = None
 
     # Últimos 5 pedidos en el orden de prioridad
-    recent = orders[:5]
-    recent_cards = "".join(_build_recent_card(o) for o in recent)
+    recent = heapq.nsmallest(5, orders, key=_sort_key)
+    counters = dashboard_counters.snapshot() if not error_msg else {
+        "delayed": 0, "ready": 0, "shipped": 0, "total_amount": 0.0, "orders": 0,
+    }
+    recent_cards = "".join(
+        fragment_cache.get_or_render(
+            ("dashboard", o.get("shipment_id") or o["order_id"], o["version"], _time_bucket(o["deadline_ts"])),
+            lambda o=o: _build_recent_card(o),
+        )
+        for o in recent
+    )
 
     error_html = ""
     if error_msg:
@@ -107,7 +209,7 @@ async def dashboard():
             </div>
         </div>"""
 
-    n = len(orders)
+    n = counters["orders"]
     empty_state = '<div class="empty-state"><p>No hay ventas pendientes</p></div>'
 
     content = f"""
@@ -116,7 +218,7 @@ async def dashboard():
                 <h1 class="page-title">Dashboard</h1>
                 <p class="page-subtitle">Resumen de tu operación en Mercado Libre</p>
             </div>
-            <a href="/" class="btn" onclick="this.textContent='Cargando…';this.style.pointerEvents='none';">Actualizar</a>
+            <a href="/?refresh=1" class="btn" onclick="this.textContent='Cargando…';this.style.pointerEvents='none';">Actualizar</a>
         </div>
 
         {error_html}
@@ -124,23 +226,23 @@ async def dashboard():
         <div class="stats">
             <div class="stat-card danger">
                 <div class="stat-label">Demorados</div>
-                <div class="stat-value">{delayed_count}</div>
+                <div class="stat-value" id="stat-delayed">{counters["delayed"]}</div>
                 <div class="stat-detail">Acción inmediata</div>
             </div>
             <div class="stat-card accent">
                 <div class="stat-label">Por enviar</div>
-                <div class="stat-value">{ready_count}</div>
+                <div class="stat-value" id="stat-ready">{counters["ready"]}</div>
                 <div class="stat-detail">Listos para despachar</div>
             </div>
             <div class="stat-card success">
                 <div class="stat-label">En camino</div>
-                <div class="stat-value">{shipped_count}</div>
+                <div class="stat-value" id="stat-shipped">{counters["shipped"]}</div>
                 <div class="stat-detail">Ya enviados</div>
             </div>
             <div class="stat-card">
                 <div class="stat-label">Venta total</div>
-                <div class="stat-value">${total_amount:,.0f}</div>
-                <div class="stat-detail">MXN · {n} pedido{"s" if n != 1 else ""}</div>
+                <div class="stat-value" id="stat-amount">${counters["total_amount"]:,.0f}</div>
+                <div class="stat-detail" id="stat-amount-detail">MXN · {n} pedido{"s" if n != 1 else ""}</div>
             </div>
         </div>
 
@@ -153,5 +255,23 @@ async def dashboard():
                 {recent_cards if recent_cards else empty_state}
             </div>
         </div>
+        <script src="{DASHBOARD_JS_ASSET.url}" defer></script>
     """
-    return HTMLResponse(content=base_layout("Dashboard", content, active="dashboard"))
+    headers = cache_headers(etag) if etag else None
+    return HTMLResponse(content=base_layout("Dashboard", content, active="dashboard"), headers=headers)
+
+
+@router.get("/api/counters")
+async def dashboard_counters_api(request: Request):
+    """Contadores de las stat cards del dashboard (los consulta la página cada 30s).
+
+    Con ETag: mientras no cambien los datos, cada consulta es un 304 vacío.
+    """
+    try:
+        await pending_snapshot.get()
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    etag = make_etag("counters", pending_snapshot.digest, label_bucket())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return JSONResponse(dashboard_counters.snapshot(), headers=cache_headers(etag))
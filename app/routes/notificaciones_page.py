@@ -1,59 +1,90 @@
 from fastapi import APIRouter
 from fastapi.responses import HTMLResponse
 from app.order_manager import order_manager
+from app.config import settings
 from app.models import ShippingPriority
+from app.push import push_dispatcher
 from app.ui import base_layout
 
 router = APIRouter()
 
 
+def _push_button_html() -> str:
+    """Botón para activar Web Push en este navegador (sólo si hay canal configurado)."""
+    if "webpush" not in push_dispatcher.channels or not settings.VAPID_PUBLIC_KEY:
+        return ""
+    return f"""
+            <button class="btn" id="push-enable" data-vapid-key="{settings.VAPID_PUBLIC_KEY}" hidden>Activar avisos</button>
+            <script>
+            (function() {{
+                const btn = document.getElementById('push-enable');
+                if (!('serviceWorker' in navigator) || !('PushManager' in window)) return;
+                btn.hidden = false;
+                function keyBytes(b64) {{
+                    const s = atob((b64 + '='.repeat((4 - b64.length % 4) % 4)).replace(/-/g, '+').replace(/_/g, '/'));
+                    return Uint8Array.from(s, function(c) {{ return c.charCodeAt(0); }});
+                }}
+                btn.addEventListener('click', async function() {{
+                    btn.disabled = true;
+                    try {{
+                        const reg = await navigator.serviceWorker.register('/sw.js');
+                        const sub = await reg.pushManager.subscribe({{
+                            userVisibleOnly: true,
+                            applicationServerKey: keyBytes(btn.dataset.vapidKey),
+                        }});
+                        const r = await fetch('/notifications/push/subscribe', {{
+                            method: 'POST',
+                            headers: {{'Content-Type': 'application/json'}},
+                            body: JSON.stringify(sub),
+                        }});
+                        btn.textContent = r.ok ? 'Avisos activados' : 'No se pudo activar';
+                    }} catch (e) {{
+                        btn.textContent = 'Permiso denegado';
+                    }}
+                }});
+            }})();
+            </script>"""
+
+
 @router.get("/", response_class=HTMLResponse)
 def notificaciones_page():
     """Página de notificaciones y alertas."""
-    orders = order_manager.get_sorted_orders()
+    pending_count = order_manager.get_pending_count()
     urgent = order_manager.get_urgent_orders()
 
     # ── Packing list ──────────────────────────────────────────────────────────
     pack_items = ""
-    for order in orders:
-        for item in order.items:
-            # Classify badge by priority (using enum comparison, not .value)
-            if order.shipping_priority == ShippingPriority.URGENT:
-                priority_cls = "badge-danger"
-            elif order.shipping_priority == ShippingPriority.HIGH:
-                priority_cls = "badge-warning"
-            else:
-                priority_cls = "badge-neutral"
-
-            sku_html = (
-                f'<span style="font-family:monospace;font-size:11px;color:var(--text-muted);">'
-                f'SKU: {item.sku}</span>'
-                if item.sku else ""
-            )
-
-            pack_items += f"""
+    for line in order_manager.get_pack_list():
+        # Classify badge by priority (using enum comparison, not .value)
+        if line["priority"] == ShippingPriority.URGENT:
+            priority_cls = "badge-danger"
+        elif line["priority"] == ShippingPriority.HIGH:
+            priority_cls = "badge-warning"
+        else:
+            priority_cls = "badge-neutral"
+
+        sku_html = (
+            f'<span style="font-family:monospace;font-size:11px;color:var(--text-muted);">'
+            f'SKU: {line["sku"]}</span>'
+            if line["sku"] else ""
+        )
+
+        pack_items += f"""
             <div class="order-card" style="cursor:default;transform:none;">
                 <div class="order-card-header">
                     <div>
-                        <div class="order-id">{item.title}</div>
+                        <div class="order-id">{line["title"]}</div>
                         <div style="font-size:12px;color:var(--text-muted);margin-top:2px;">
-                            Orden #{order.order_id}{f' &middot; {sku_html}' if item.sku else ''}
+                            Orden #{line["order_id"]}{f' &middot; {sku_html}' if line["sku"] else ''}
                         </div>
                     </div>
-                    <span class="badge {priority_cls}">x{item.quantity}</span>
+                    <span class="badge {priority_cls}">x{line["quantity"]}</span>
                 </div>
             </div>"""
 
     # ── Product frequency ─────────────────────────────────────────────────────
-    product_count: dict[str, dict] = {}
-    for order in orders:
-        for item in order.items:
-            key = item.item_id
-            if key not in product_count:
-                product_count[key] = {"title": item.title, "sku": item.sku, "total": 0}
-            product_count[key]["total"] += item.quantity
-
-    sorted_products = sorted(product_count.values(), key=lambda x: x["total"], reverse=True)
+    sorted_products = order_manager.get_product_totals()
+    max_total = max(1, sorted_products[0]["total_sold"]) if sorted_products else 1
 
     stock_rows = ""
     for p in sorted_products:
@@ -61,7 +92,7 @@ def notificaciones_page():
             f'<br><span style="color:var(--text-muted);font-size:11px;font-family:monospace;">{p["sku"]}</span>'
             if p["sku"] else ""
         )
-        bar_pct = min(100, int(p["total"] / max(1, max(x["total"] for x in sorted_products)) * 100))
+        bar_pct = min(100, int(p["total_sold"] / max_total * 100))
         stock_rows += f"""<tr>
             <td>
                 {p["title"]}{sku_text}
@@ -70,11 +101,23 @@ def notificaciones_page():
                 </div>
             </td>
             <td style="text-align:right;font-weight:700;color:var(--accent);font-size:16px;">
-                {p["total"]}
+                {p["total_sold"]}
             </td>
         </tr>"""
 
-    total_items = sum(item.quantity for o in orders for item in o.items)
+    # ── Sales velocity ────────────────────────────────────────────────────────
+    windows = list(order_manager.sales.windows)
+    velocity_head = "".join(f'<th style="text-align:right;">{w}</th>' for w in windows)
+    velocity_rows = ""
+    for p in order_manager.get_sales_velocity()[:20]:
+        sku_text = (
+            f'<br><span style="color:var(--text-muted);font-size:11px;font-family:monospace;">{p["sku"]}</span>'
+            if p["sku"] else ""
+        )
+        cells = "".join(f'<td style="text-align:right;">{p["sold"][w]}</td>' for w in windows)
+        velocity_rows += f"<tr><td>{p['title']}{sku_text}</td>{cells}</tr>"
+
+    total_items = order_manager.get_total_units()
     urgent_cls = "danger" if urgent else "success"
 
     content = f"""
@@ -83,6 +126,7 @@ def notificaciones_page():
                 <h1 class="page-title">Notificaciones</h1>
                 <p class="page-subtitle">Alertas, lista de empaque y productos más vendidos</p>
             </div>
+            {_push_button_html()}
         </div>
 
         <div class="stats">
@@ -93,7 +137,7 @@ def notificaciones_page():
             </div>
             <div class="stat-card accent">
                 <div class="stat-label">Pendientes</div>
-                <div class="stat-value">{len(orders)}</div>
+                <div class="stat-value">{pending_count}</div>
                 <div class="stat-detail">Órdenes activas</div>
             </div>
             <div class="stat-card">
@@ -125,6 +169,18 @@ def notificaciones_page():
                     else '<div class="empty-state"><span class="icon">📊</span><p>Sin datos aún</p></div>'
                 }
             </div>
+
+            <div class="table-wrapper">
+                <div class="table-header">
+                    <h2>Ritmo de venta</h2>
+                    <span class="badge badge-neutral">unidades vendidas</span>
+                </div>
+                {
+                    f'<table><thead><tr><th>Producto</th>{velocity_head}</tr></thead><tbody>{velocity_rows}</tbody></table>'
+                    if velocity_rows
+                    else '<div class="empty-state"><span class="icon">📈</span><p>Sin ventas recientes</p></div>'
+                }
+            </div>
         </div>
     """
     return HTMLResponse(content=base_layout("Notificaciones", content, active="notificaciones"))
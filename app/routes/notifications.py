@@ -1,13 +1,25 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
 from app.order_manager import order_manager
-from app.models import NotificationMessage, ShippingPriority
+from app.models import NotificationMessage, PushSubscription, ShippingPriority
+from app.push import push_dispatcher
 
 router = APIRouter()
 
 
-@router.get("/pending")
-def get_pending_notifications() -> list[NotificationMessage]:
-    """Genera las notificaciones pendientes para enviar al teléfono."""
+# Horizonte por defecto de /pick-waves: lo que vence en las próximas horas
+PICK_WAVE_DEFAULT_HOURS = 24
+
+# Tope de espera del long-poll, por debajo del timeout típico de un proxy (60s)
+LONG_POLL_MAX_SECONDS = 50
+
+# Mensajes de /pending ya armados, por versión de las órdenes pendientes
+_pending_cache: dict = {"version": None, "messages": []}
+
+
+def _build_pending_messages() -> list[NotificationMessage]:
     messages = []
 
     urgent = order_manager.get_urgent_orders()
@@ -34,50 +46,76 @@ def get_pending_notifications() -> list[NotificationMessage]:
     return messages
 
 
+def _pending_messages() -> list[NotificationMessage]:
+    version = order_manager.pending_version
+    if _pending_cache["version"] != version:
+        _pending_cache["messages"] = _build_pending_messages()
+        _pending_cache["version"] = version
+    return _pending_cache["messages"]
+
+
+@router.get("/pending")
+async def get_pending_notifications(since: int | None = None, wait: float = 0) -> list[NotificationMessage]:
+    """Genera las notificaciones pendientes para enviar al teléfono.
+
+    La versión de las órdenes va en el header ``X-Version``. Con
+    ``?since=<versión>&wait=<segundos>`` la petición espera (hasta
+    ``LONG_POLL_MAX_SECONDS``) a que las órdenes pendientes cambien después
+    de esa versión; si no cambian responde 204 sin cuerpo y con la misma
+    ``X-Version`` que mandó el cliente, para que vuelva a preguntar igual.
+    """
+    # Una versión del futuro (p. ej. el servidor reinició sin estado
+    # persistente) no se espera: se responde con la actual
+    if since is not None and since <= order_manager.version:
+        if not await order_manager.wait_for_pending_change(since, min(max(wait, 0), LONG_POLL_MAX_SECONDS)):
+            return Response(status_code=204, headers={"X-Version": str(since)})
+    version = order_manager.version
+    messages = _pending_messages()
+    return JSONResponse(
+        [m.model_dump(mode="json") for m in messages],
+        headers={"X-Version": str(version)},
+    )
+
+
 @router.get("/what-to-pack")
 def what_to_pack():
     """Lista qué productos empacar, en orden de prioridad."""
-    orders = order_manager.get_sorted_orders()
-    pack_list = []
-    for order in orders:
-        for item in order.items:
-            pack_list.append({
-                "order_id": order.order_id,
-                "priority": order.shipping_priority,
-                "deadline": order.shipping_deadline,
-                "title": item.title,
-                "quantity": item.quantity,
-                "sku": item.sku,
-            })
+    pack_list = order_manager.get_pack_list()
     return {"pack_list": pack_list, "total_items": len(pack_list)}
 
 
+@router.get("/pick-waves")
+def pick_waves(
+    by: Literal["sku", "album"] = "sku",
+    cutoff: datetime | None = None,
+    hours: float = PICK_WAVE_DEFAULT_HOURS,
+):
+    """Olas de picking: artículos de todas las órdenes que vencen antes del corte.
+
+    El corte es ``cutoff`` (ISO 8601) o, si no se da, ahora + ``hours``. Cada
+    ola junta un SKU (o álbum con ``?by=album``) con sus unidades totales y
+    las órdenes que lo llevan, para recorrer el anaquel una sola vez.
+    """
+    if cutoff is None:
+        cutoff = datetime.now(timezone.utc) + timedelta(hours=hours)
+    elif cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    return order_manager.get_pick_waves(cutoff, by)
+
+
 @router.get("/stock-alert")
-def stock_alert():
-    """Muestra qué productos se están vendiendo más para saber qué hace falta."""
-    orders = order_manager.get_sorted_orders()
-    product_count: dict[str, dict] = {}
-
-    for order in orders:
-        for item in order.items:
-            key = item.item_id
-            if key not in product_count:
-                product_count[key] = {
-                    "item_id": item.item_id,
-                    "title": item.title,
-                    "sku": item.sku,
-                    "total_sold": 0,
-                }
-            product_count[key]["total_sold"] += item.quantity
-
-    # Ordenar por más vendido
-    sorted_products = sorted(
-        product_count.values(),
-        key=lambda x: x["total_sold"],
-        reverse=True,
-    )
+def stock_alert(by: Literal["item", "sku"] = "item"):
+    """Muestra qué productos se están vendiendo más para saber qué hace falta.
 
-    return {"products": sorted_products}
+    ``products`` son las unidades de las órdenes pendientes; ``velocity`` las
+    vendidas por producto (o por SKU con ``?by=sku``) en cada ventana de
+    ``SALES_WINDOWS``, aunque las órdenes ya se hayan entregado.
+    """
+    return {
+        "products": order_manager.get_product_totals(),
+        "windows": list(order_manager.sales.windows),
+        "velocity": order_manager.get_sales_velocity(by),
+    }
 
 
 @router.get("/phone-summary")
@@ -103,3 +141,27 @@ def phone_summary():
             },
         }
     }
+
+
+@router.get("/push/status")
+def push_status():
+    """Canales push configurados, pendientes, envíos, fallas y latencia de entrega."""
+    return push_dispatcher.status()
+
+
+@router.post("/push/subscribe")
+def push_subscribe(subscription: PushSubscription):
+    """Registra un navegador para recibir los avisos por Web Push."""
+    channel = push_dispatcher.channels.get("webpush")
+    if channel is None:
+        return JSONResponse({"error": "Web Push no está configurado"}, status_code=404)
+    channel.transport.subscribe(subscription.model_dump())
+    return {"status": "subscribed", "subscriptions": len(channel.transport.subscriptions)}
+
+
+@router.post("/push/unsubscribe")
+def push_unsubscribe(subscription: PushSubscription):
+    channel = push_dispatcher.channels.get("webpush")
+    if channel is not None:
+        channel.transport.unsubscribe(subscription.endpoint)
+    return {"status": "unsubscribed"}
@@ -1,16 +1,52 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.http_cache import cache_headers, etag_matches, make_etag, not_modified
 from app.order_manager import order_manager
+from app.reconciler import reconciler
 
 router = APIRouter()
 
 
 @router.get("/")
-def list_orders():
+def list_orders(request: Request):
     """Lista todas las órdenes pendientes ordenadas por prioridad de envío."""
+    version = order_manager.version
+    etag = make_etag("orders", order_manager.backend.instance_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     orders = order_manager.get_sorted_orders()
-    return {
+    return JSONResponse({
+        "version": version,
         "total_pending": len(orders),
-        "orders": [o.model_dump() for o in orders],
+        "orders": [o.model_dump(mode="json") for o in orders],
+    }, headers=cache_headers(etag))
+
+
+@router.get("/changes")
+def list_changes(since: int = 0):
+    """Cambios posteriores a la versión ``since``.
+
+    Si los eventos pedidos ya salieron de la bitácora (o ``since`` es de
+    antes de un reinicio) regresa ``reset: true`` y el cliente debe volver a
+    pedir /orders/ completo.
+    """
+    version = order_manager.version
+    changes = order_manager.changes_since(since) if since <= version else None
+    if changes is None:
+        return {"version": version, "reset": True, "changes": []}
+    return {
+        "version": changes[-1]["version"] if changes else version,
+        "reset": False,
+        "changes": [
+            {
+                "version": c["version"],
+                "type": c["type"],
+                "order_id": c["order_id"],
+                "order": c["order"].model_dump() if c["order"] is not None else None,
+                "at": c["at"],
+            }
+            for c in changes
+        ],
     }
 
 
@@ -25,9 +61,9 @@ def list_urgent():
 
 
 @router.post("/cleanup")
-def cleanup_orders():
-    """Elimina las órdenes ya completadas (entregadas/canceladas)."""
-    removed = order_manager.cleanup_completed()
+async def cleanup_orders():
+    """Elimina ya las órdenes completadas (entregadas/canceladas), sin esperar su periodo de gracia."""
+    removed = await order_manager.evict_expired(force=True)
     return {
         "removed_count": len(removed),
         "removed_ids": removed,
@@ -45,3 +81,9 @@ def orders_summary():
         "urgent": len(urgent),
         "next_to_ship": orders[0].model_dump() if orders else None,
     }
+
+
+@router.get("/reconciliation")
+def reconciliation_status():
+    """Métricas de drift de la reconciliación contra ML."""
+    return reconciler.status()
@@ -1,8 +1,21 @@
-from fastapi import APIRouter
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from datetime import datetime, timezone
+import asyncio
+import bisect
+import json
+import math
+import time
+from collections import OrderedDict
+from app.fragment_cache import fragment_cache
+from app.http_cache import cache_headers, etag_matches, label_bucket, make_etag, not_modified
+from app.live import live_hub, sse_message
 from app.meli_client import meli
-from app.ui import base_layout
+from app.order_sync import extract_album
+from app.push import push_dispatcher
+from app.snapshot import entry_version, pending_snapshot
+from app.thumbs import thumb_url
+from app.ui import ASSETS_VERSION, VENTAS_JS_ASSET, base_layout, layout_head, layout_tail
 
 router = APIRouter()
 
@@ -18,6 +31,20 @@ def _parse_date(date_str: str | None) -> datetime | None:
         return None
 
 
+def _to_ts(date_str: str | None) -> int | None:
+    """Fecha ISO a epoch (segundos). Sin zona horaria se asume UTC."""
+    dt = _parse_date(date_str)
+    if not dt:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+# Para ordenar al final lo que no tiene fecha
+MAX_TS = 2**63 - 1
+
+
 def _format_date_short(date_str: str | None) -> str:
     dt = _parse_date(date_str)
     if not dt:
@@ -111,7 +138,7 @@ def _get_ship_by_date(shipment: dict | None) -> str | None:
 
 # ── Status classification ─────────────────────────────────────────────────────
 
-def _classify_status(shipment: dict | None, deadline_str: str | None) -> tuple[str, str, str]:
+def _classify_status(shipment: dict | None, deadline_ts: int | None) -> tuple[str, str, str]:
     """
     Clasifica el estado real cruzando status + substatus + deadline.
     Retorna (label, badge_class, category).
@@ -130,9 +157,8 @@ def _classify_status(shipment: dict | None, deadline_str: str | None) -> tuple[s
 
     # ¿Está demorado? Por substatus explícito o deadline pasado
     is_delayed = substatus == "handling_time_over"
-    if not is_delayed and deadline_str and status in ("ready_to_ship", "pending"):
-        deadline_dt = _parse_date(deadline_str)
-        if deadline_dt and datetime.now(timezone.utc) > deadline_dt:
+    if not is_delayed and deadline_ts is not None and status in ("ready_to_ship", "pending"):
+        if time.time() > deadline_ts:
             is_delayed = True
 
     if status == "shipped":
@@ -170,14 +196,10 @@ def _classify_status(shipment: dict | None, deadline_str: str | None) -> tuple[s
     return label, "badge-neutral", "pending"
 
 
-def _tiempo_restante(deadline_str: str | None) -> tuple[str, str]:
-    if not deadline_str:
+def _tiempo_restante(deadline_ts: int | None) -> tuple[str, str]:
+    if deadline_ts is None:
         return "—", "badge-neutral"
-    dt = _parse_date(deadline_str)
-    if not dt:
-        return "—", "badge-neutral"
-    now = datetime.now(timezone.utc)
-    hours = (dt - now).total_seconds() / 3600
+    hours = (deadline_ts - time.time()) / 3600
     if hours < 0:
         abs_h = abs(int(hours))
         if abs_h >= 24:
@@ -193,54 +215,60 @@ def _tiempo_restante(deadline_str: str | None) -> tuple[str, str]:
 
 # ── Data enrichment ───────────────────────────────────────────────────────────
 
-def _extract_album(order_item: dict) -> str:
-    """Extrae el nombre del álbum desde variation_attributes del order_item."""
-    attrs = order_item.get("item", {}).get("variation_attributes") or []
-    for attr in attrs:
-        name = (attr.get("name") or "").lower()
-        if "lbum" in name or "versi" in name:
-            return attr.get("value_name") or ""
-    return ""
+ENRICH_CACHE_SIZE = 5000
 
+# entry_version -> [registro enriquecido, shipment, bucket de tiempo con el
+# que se calcularon estado y tiempo restante]
+_enrich_cache: OrderedDict[tuple, list] = OrderedDict()
 
-def _enrich_order(item: dict) -> dict:
-    """Enriquece un pedido con datos procesados para UI y API."""
+
+def _enrich_static(item: dict, version: tuple) -> dict:
+    """Parte del registro enriquecido que sólo depende de los datos del pedido."""
     order = item["order"]
     shipment = item.get("shipment")
 
     deadline_str = _get_deadline(shipment)
-    ship_by = _get_ship_by_date(shipment)
     delivery_str = _get_delivery_date(shipment)
-    status_label, status_cls, category = _classify_status(shipment, deadline_str)
-    tiempo_text, tiempo_cls = _tiempo_restante(deadline_str)
-
+    date_created = order.get("date_created", "")
     return {
         "order_id": order.get("id", "?"),
         "shipment_id": item.get("shipment_id"),
+        "version": hash(version),
         "buyer": order.get("buyer", {}).get("nickname", "—"),
         "buyer_id": order.get("buyer", {}).get("id"),
         "total": order.get("total_amount", 0),
         "currency": order.get("currency_id", "MXN"),
-        "date_created": order.get("date_created", ""),
+        "date_created": date_created,
         "deadline_str": deadline_str,
-        "ship_by": ship_by,
+        "ship_by": _get_ship_by_date(shipment),
         "delivery_str": delivery_str,
-        "status_label": status_label,
-        "status_cls": status_cls,
-        "category": category,
-        "tiempo_text": tiempo_text,
-        "tiempo_cls": tiempo_cls,
+        # Epoch (segundos) parseados una sola vez: ordenar y clasificar
+        # compara enteros en vez de volver a parsear las fechas ISO
+        "created_ts": _to_ts(date_created),
+        "deadline_ts": _to_ts(deadline_str),
+        "delivery_ts": _to_ts(delivery_str),
+        # Relativos al momento actual: los llena _enrich_order
+        "status_label": None,
+        "status_cls": None,
+        "category": None,
+        "tiempo_text": None,
+        "tiempo_cls": None,
         "logistic": shipment.get("logistic_type", "—") if shipment else "—",
         "shipping_status_raw": shipment.get("status") if shipment else None,
         "shipping_substatus_raw": shipment.get("substatus") if shipment else None,
         "items": [
             {
                 "title": oi.get("item", {}).get("title", "?"),
-                "album": _extract_album(oi),
+                "album": extract_album(oi),
                 "qty": oi.get("quantity", 1),
                 "sku": oi.get("item", {}).get("seller_sku", "") or "",
                 "unit_price": oi.get("unit_price", 0),
                 "thumbnail": oi.get("item", {}).get("thumbnail", "") or "",
+                "thumb_url": thumb_url(
+                    str(oi.get("item", {}).get("id", "")),
+                    oi.get("item", {}).get("variation_id"),
+                    oi.get("item", {}).get("thumbnail", "") or "",
+                ),
                 "item_id": str(oi.get("item", {}).get("id", "")),
             }
             for oi in order.get("order_items", [])
@@ -248,6 +276,41 @@ def _enrich_order(item: dict) -> dict:
     }
 
 
+def _enrich_order(item: dict) -> dict:
+    """Enriquece un pedido con datos procesados para UI y API.
+
+    Se calcula una vez por versión del pedido (``entry_version``); estado,
+    categoría y tiempo restante se recalculan sólo cuando cambia el bucket de
+    horas al deadline (ver ``_time_bucket``). Regresa una copia: quien la
+    recibe puede modificarla (p. ej. agrupar items de un mismo envío).
+    """
+    version = entry_version(item)
+    cached = _enrich_cache.get(version)
+    if cached is None:
+        cached = [_enrich_static(item, version), item.get("shipment"), object()]
+        _enrich_cache[version] = cached
+        if len(_enrich_cache) > ENRICH_CACHE_SIZE:
+            _enrich_cache.popitem(last=False)
+    else:
+        _enrich_cache.move_to_end(version)
+
+    record, shipment, bucket = cached
+    deadline_ts = record["deadline_ts"]
+    now_bucket = _time_bucket(deadline_ts)
+    if now_bucket != bucket:
+        status_label, status_cls, category = _classify_status(shipment, deadline_ts)
+        tiempo_text, tiempo_cls = _tiempo_restante(deadline_ts)
+        record.update(
+            status_label=status_label,
+            status_cls=status_cls,
+            category=category,
+            tiempo_text=tiempo_text,
+            tiempo_cls=tiempo_cls,
+        )
+        cached[2] = now_bucket
+    return {**record, "items": list(record["items"])}
+
+
 # ── HTML builders ─────────────────────────────────────────────────────────────
 
 def _build_product_html(items: list[dict]) -> str:
@@ -262,7 +325,8 @@ def _build_product_html(items: list[dict]) -> str:
             if p.get("album") else ""
         )
         thumb_html = (
-            f'<img src="{p["thumbnail"]}" class="item-row-thumb" alt="">'
+            f'<img src="{p.get("thumb_url") or p["thumbnail"]}" class="item-row-thumb" alt=""'
+            f' width="60" height="60" loading="lazy" decoding="async">'
             if p.get("thumbnail")
             else '<div class="item-row-thumb-empty"></div>'
         )
@@ -319,7 +383,7 @@ def _build_order_card_html(o: dict) -> str:
     shipment_id = o.get("shipment_id") or order_id
 
     return f"""
-    <div class="pedido-card" style="border-left:4px solid {border_color};"
+    <div class="pedido-card" data-shipment-id="{shipment_id}" style="border-left:4px solid {border_color};"
          onclick="openShipmentModal({shipment_id!r})" role="button" tabindex="0"
          onkeydown="if(event.key==='Enter')openShipmentModal({shipment_id!r})">
         <div class="pedido-header" style="background:{header_bg};">
@@ -360,10 +424,55 @@ def _build_order_card_html(o: dict) -> str:
     </div>"""
 
 
-def _build_section(title: str, icon: str, orders: list[dict], section_id: str) -> str:
-    if not orders:
+def _time_bucket(deadline_ts: int | None) -> int | None:
+    """Horas (piso) hasta el deadline: mientras no cambie, tampoco cambian
+    ``tiempo_text`` ni el estado de demorado de la tarjeta."""
+    if deadline_ts is None:
+        return None
+    return math.floor((deadline_ts - time.time()) / 3600)
+
+
+def _render_order_card(o: dict) -> str:
+    """Card de un pedido desde el cache de fragmentos, renderizándola si hace falta."""
+    key = ("ventas", o.get("shipment_id") or o["order_id"], o["version"], _time_bucket(o["deadline_ts"]))
+    return fragment_cache.get_or_render(key, lambda: _build_order_card_html(o))
+
+
+# Tarjetas por sección en el HTML inicial; el resto se pide por
+# /ventas/api/cards al acercarse al final de la sección
+SECTION_PAGE_SIZE = 50
+
+
+def _card_key(o: dict) -> tuple:
+    """Orden total de las tarjetas dentro de una sección (llave del cursor)."""
+    return (_sort_key(o)[1], str(o.get("shipment_id") or o["order_id"]))
+
+
+def _encode_card_cursor(o: dict) -> str:
+    ts, sid = _card_key(o)
+    return f"{ts}_{sid}"
+
+
+def _decode_card_cursor(cursor: str) -> tuple:
+    ts, _, sid = cursor.partition("_")
+    return (int(ts), sid)
+
+
+def _section_more_html(section_id: str, orders: list[dict], shown: int) -> str:
+    if shown >= len(orders):
         return ""
+    return (
+        f'<div class="section-more" data-section="{section_id}" '
+        f'data-next="{_encode_card_cursor(orders[shown - 1])}">Cargando más pedidos…</div>'
+    )
 
+
+def _build_section(title: str, icon: str, orders: list[dict], section_id: str) -> str:
+    """Sección de una categoría con sus primeras ``SECTION_PAGE_SIZE`` tarjetas.
+
+    Se renderiza aunque esté vacía (oculta) para que el script en vivo pueda
+    meterle tarjetas nuevas.
+    """
     border_map = {
         "delayed": "var(--danger)",
         "ready":   "var(--accent)",
@@ -371,14 +480,16 @@ def _build_section(title: str, icon: str, orders: list[dict], section_id: str) -
         "pending": "var(--warning)",
     }
     border_color = border_map.get(section_id, "var(--border)")
-    cards_html = "".join(_build_order_card_html(o) for o in orders)
+    window = orders[:SECTION_PAGE_SIZE]
+    cards_html = "".join(_render_order_card(o) for o in window)
 
     return f"""
-    <div class="section" style="border-top:3px solid {border_color};">
+    <div class="section" id="section-{section_id}" style="border-top:3px solid {border_color};"{"" if orders else " hidden"}>
         <div class="section-header">
             <h2>{title} <span class="section-count">({len(orders)})</span></h2>
         </div>
-        {cards_html}
+        <div class="card-page">{cards_html}</div>
+        {_section_more_html(section_id, orders, len(window))}
     </div>"""
 
 
@@ -389,37 +500,30 @@ CATEGORY_ORDER = {"delayed": 0, "ready": 1, "pending": 2, "shipped": 3, "other":
 
 def _sort_key(order: dict) -> tuple:
     cat = CATEGORY_ORDER.get(order["category"], 99)
-    deadline_dt = _parse_date(order["deadline_str"])
-    if not deadline_dt:
-        deadline_dt = _parse_date(order["date_created"]) or datetime.max.replace(tzinfo=timezone.utc)
-    return (cat, deadline_dt)
+    ts = order["deadline_ts"]
+    if ts is None:
+        ts = order["created_ts"]
+    return (cat, MAX_TS if ts is None else ts)
 
 
 # ── Routes ────────────────────────────────────────────────────────────────────
 
-@router.get("/", response_class=HTMLResponse)
-async def ventas_pendientes():
-    """Muestra los pedidos pendientes organizados por prioridad."""
-    try:
-        data = await meli.get_pending_shipments()
-    except Exception as e:
-        error_content = f"""
-            <div class="page-header">
-                <div>
-                    <h1 class="page-title">Ventas Pendientes</h1>
-                    <p class="page-subtitle">Pedidos organizados por prioridad de envío</p>
-                </div>
-            </div>
-            <div class="error-banner">
-                <div>
-                    <strong>Error al conectar con Mercado Libre</strong>
-                    <p>{e}</p>
-                    <p style="margin-top:6px;font-size:12px;">Verifica que ACCESS_TOKEN y USER_ID estén configurados.</p>
-                </div>
-            </div>"""
-        return HTMLResponse(content=base_layout("Error — Ventas", error_content, active="ventas"), status_code=500)
-
-    # Enriquecer y filtrar entregados/cancelados
+def _merge_shipment_order(existing: dict, o: dict) -> None:
+    """Suma una orden más del mismo envío al representante del grupo."""
+    existing["items"].extend(o["items"])
+    existing["total"] += o["total"]
+    existing["version"] = hash((existing["version"], o["version"]))
+    # Mantener la categoría más urgente
+    if CATEGORY_ORDER.get(o["category"], 99) < CATEGORY_ORDER.get(existing["category"], 99):
+        existing["category"] = o["category"]
+        existing["status_label"] = o["status_label"]
+        existing["status_cls"] = o["status_cls"]
+        existing["tiempo_text"] = o["tiempo_text"]
+        existing["tiempo_cls"] = o["tiempo_cls"]
+
+
+def _group_pending(data: list[dict]) -> list[dict]:
+    """Enriquece, filtra entregados/cancelados y agrupa por envío, en orden de prioridad."""
     raw_orders = []
     for item in data:
         order = item["order"]
@@ -431,78 +535,425 @@ async def ventas_pendientes():
         raw_orders.append(_enrich_order(item))
 
     # Agrupar por shipment_id (ML crea un order_id por artículo pero un solo envío)
-    CAT_PRIORITY = {"delayed": 0, "ready": 1, "pending": 2, "shipped": 3, "other": 4}
     seen_shipments: dict = {}
     orders = []
     for o in raw_orders:
         sid = o.get("shipment_id")
         if sid and sid in seen_shipments:
-            # Combinar items y total en el primer representante del grupo
-            existing = seen_shipments[sid]
-            existing["items"].extend(o["items"])
-            existing["total"] += o["total"]
-            # Mantener la categoría más urgente
-            if CAT_PRIORITY.get(o["category"], 99) < CAT_PRIORITY.get(existing["category"], 99):
-                existing["category"] = o["category"]
-                existing["status_label"] = o["status_label"]
-                existing["status_cls"] = o["status_cls"]
-                existing["tiempo_text"] = o["tiempo_text"]
-                existing["tiempo_cls"] = o["tiempo_cls"]
+            _merge_shipment_order(seen_shipments[sid], o)
         else:
             if sid:
                 seen_shipments[sid] = o
             orders.append(o)
 
-    orders.sort(key=_sort_key)
+    orders.sort(key=lambda o: (CATEGORY_ORDER.get(o["category"], 99), _card_key(o)))
+    return orders
 
-    delayed = [o for o in orders if o["category"] == "delayed"]
-    ready   = [o for o in orders if o["category"] == "ready"]
-    pending = [o for o in orders if o["category"] == "pending"]
-    shipped = [o for o in orders if o["category"] == "shipped"]
 
-    total_amount = sum(o["total"] for o in orders)
-    n = len(orders)
+# Vista agrupada por (versión del snapshot, bucket de etiquetas): la página y
+# /ventas/api/cards la comparten en vez de reagrupar en cada petición
+_pending_view: dict = {"key": None, "orders": [], "sections": {}}
+
+
+def _pending_lookup() -> tuple[list[dict], dict[str, list[dict]]]:
+    key = (pending_snapshot.version, label_bucket())
+    if _pending_view["key"] != key:
+        orders = _group_pending(pending_snapshot.data or [])
+        sections: dict[str, list[dict]] = {}
+        for o in orders:
+            sections.setdefault(o["category"], []).append(o)
+        _pending_view.update(key=key, orders=orders, sections=sections)
+    return _pending_view["orders"], _pending_view["sections"]
 
-    content = f"""
+
+def _visible_orders(sections: dict[str, list[dict]]) -> list[dict]:
+    """Las tarjetas que van en el HTML inicial (la primera ventana de cada sección)."""
+    return [o for _, category in VENTAS_SECTIONS for o in sections.get(category, [])[:SECTION_PAGE_SIZE]]
+
+
+VENTAS_SECTIONS = [
+    ("Demorados", "delayed"),
+    ("Listos para enviar", "ready"),
+    ("Pendientes", "pending"),
+    ("En camino", "shipped"),
+]
+
+
+def _ventas_header_html() -> str:
+    return """
         <div class="page-header">
             <div>
                 <h1 class="page-title">Ventas Pendientes</h1>
                 <p class="page-subtitle">Pedidos organizados por prioridad de envío — haz clic en un pedido para ver el detalle</p>
             </div>
-            <a href="/ventas/" class="btn" onclick="this.textContent='Cargando…';this.style.pointerEvents='none';">Actualizar</a>
+            <a href="/ventas/?refresh=1" class="btn" id="ventas-refresh" onclick="this.textContent='Cargando…';this.style.pointerEvents='none';">Actualizar</a>
         </div>
+"""
+
 
+def _stats_values(orders: list[dict]) -> dict[str, str]:
+    n = len(orders)
+    total_amount = sum(o["total"] for o in orders)
+    return {
+        "delayed": str(sum(1 for o in orders if o["category"] == "delayed")),
+        "ready": str(sum(1 for o in orders if o["category"] == "ready")),
+        "shipped": str(sum(1 for o in orders if o["category"] == "shipped")),
+        "amount": f"${total_amount:,.0f}",
+        "amount-detail": f"MXN · {n} pedido{'s' if n != 1 else ''}",
+    }
+
+
+def _stats_html(values: dict[str, str] | None) -> str:
+    """Stat cards; con ``values=None`` es el esqueleto que se llena después."""
+    v = values or {"delayed": "…", "ready": "…", "shipped": "…", "amount": "…", "amount-detail": "MXN"}
+    return f"""
         <div class="stats">
             <div class="stat-card danger">
                 <div class="stat-label">Demorados</div>
-                <div class="stat-value">{len(delayed)}</div>
+                <div class="stat-value" id="stat-delayed">{v["delayed"]}</div>
                 <div class="stat-detail">Acción inmediata</div>
             </div>
             <div class="stat-card accent">
                 <div class="stat-label">Por enviar</div>
-                <div class="stat-value">{len(ready)}</div>
+                <div class="stat-value" id="stat-ready">{v["ready"]}</div>
                 <div class="stat-detail">Listos para despachar</div>
             </div>
             <div class="stat-card success">
                 <div class="stat-label">En camino</div>
-                <div class="stat-value">{len(shipped)}</div>
+                <div class="stat-value" id="stat-shipped">{v["shipped"]}</div>
                 <div class="stat-detail">Ya enviados</div>
             </div>
             <div class="stat-card">
                 <div class="stat-label">Venta total</div>
-                <div class="stat-value">${total_amount:,.0f}</div>
-                <div class="stat-detail">MXN · {n} pedido{"s" if n != 1 else ""}</div>
+                <div class="stat-value" id="stat-amount">{v["amount"]}</div>
+                <div class="stat-detail" id="stat-amount-detail">{v["amount-detail"]}</div>
             </div>
         </div>
+"""
 
-        {_build_section("Demorados", "", delayed, "delayed")}
-        {_build_section("Listos para enviar", "", ready, "ready")}
-        {_build_section("Pendientes", "", pending, "pending")}
-        {_build_section("En camino", "", shipped, "shipped")}
 
-        {"" if orders else '<div class="empty-state"><p>No hay ventas pendientes</p></div>'}
+def _error_banner_html(e: Exception) -> str:
+    return f"""
+            <div class="error-banner">
+                <div>
+                    <strong>Error al conectar con Mercado Libre</strong>
+                    <p>{e}</p>
+                    <p style="margin-top:6px;font-size:12px;">Verifica que ACCESS_TOKEN y USER_ID estén configurados.</p>
+                </div>
+            </div>"""
+
+
+def _empty_html(hidden: bool) -> str:
+    return f'<div class="empty-state" id="ventas-empty"{" hidden" if hidden else ""}><p>No hay ventas pendientes</p></div>'
+
+
+def _live_state() -> str:
+    """Estado de la vista de /ventas/: igual en todos los workers para los mismos datos."""
+    return f"{pending_snapshot.digest}.{label_bucket()}"
+
+
+def _ventas_scripts_html() -> str:
+    """Script de la página: paginación de secciones y conexión a /ventas/events
+    desde el estado que la página ya refleja."""
+    return f'<div id="ventas-live" data-live-seq="{_live_state()}" hidden></div><script src="{VENTAS_JS_ASSET.url}" defer></script>'
+
+
+async def _stream_ventas(refresh: bool):
+    """Manda el esqueleto de la página de inmediato y cada sección al tenerla."""
+    yield layout_head("Ventas Pendientes", active="ventas") + _ventas_header_html() + _stats_html(None)
+    try:
+        data = await (pending_snapshot.refresh() if refresh else pending_snapshot.get())
+    except Exception as e:
+        yield _error_banner_html(e) + layout_tail(active="ventas")
+        return
+
+    orders, sections = _pending_lookup()
+    values = _stats_values(orders)
+    # Llenar el esqueleto de las stats sin esperar al resto del documento
+    yield "<script>" + "".join(
+        f"document.getElementById('stat-{key}').textContent={value!r};" for key, value in values.items()
+    ) + "</script>"
+    for title, category in VENTAS_SECTIONS:
+        yield _build_section(title, "", sections.get(category, []), category)
+    yield (
+        _empty_html(hidden=bool(orders)) + _details_blob_html(_visible_orders(sections))
+        + _ventas_scripts_html() + layout_tail(active="ventas")
+    )
+
+
+@router.get("/", response_class=HTMLResponse)
+async def ventas_pendientes(request: Request, refresh: bool = False, stream: bool | None = None):
+    """Muestra los pedidos pendientes organizados por prioridad.
+
+    Si hay que ir a ML por los datos (``refresh`` o snapshot vencido), la
+    página se manda en streaming: layout, navbar y esqueleto de stats salen
+    de inmediato y las secciones llegan cuando están listas. ``stream``
+    fuerza (1) o desactiva (0) ese modo.
     """
-    return HTMLResponse(content=base_layout("Ventas Pendientes", content, active="ventas"))
+    if stream is None:
+        stream = refresh or not pending_snapshot.is_fresh
+    if stream:
+        return StreamingResponse(_stream_ventas(refresh), media_type="text/html; charset=utf-8")
+
+    try:
+        data = await (pending_snapshot.refresh() if refresh else pending_snapshot.get())
+    except Exception as e:
+        error_content = f"""
+            <div class="page-header">
+                <div>
+                    <h1 class="page-title">Ventas Pendientes</h1>
+                    <p class="page-subtitle">Pedidos organizados por prioridad de envío</p>
+                </div>
+            </div>{_error_banner_html(e)}"""
+        return HTMLResponse(content=base_layout("Error — Ventas", error_content, active="ventas"), status_code=500)
+
+    etag = make_etag("ventas", pending_snapshot.digest, label_bucket(), ASSETS_VERSION)
+    if not refresh and etag_matches(request, etag):
+        return not_modified(etag)
+
+    orders, sections = _pending_lookup()
+    sections_html = "".join(
+        _build_section(title, "", sections.get(category, []), category)
+        for title, category in VENTAS_SECTIONS
+    )
+    content = f"""{_ventas_header_html()}{_stats_html(_stats_values(orders))}
+        {sections_html}
+
+        {_empty_html(hidden=bool(orders))}
+        {_details_blob_html(_visible_orders(sections))}
+        {_ventas_scripts_html()}
+    """
+    return HTMLResponse(content=base_layout("Ventas Pendientes", content, active="ventas"), headers=cache_headers(etag))
+
+
+# ── Live updates (SSE) ───────────────────────────────────────────────────────
+
+LIVE_PING_SECONDS = 15
+
+# Última vista publicada: shipment_id -> (versión, categoría, tiempo_text)
+_live_view: dict[str, tuple] | None = None
+
+
+def _publish_ventas_deltas(data: list[dict]) -> None:
+    """Compara la vista agrupada nueva contra la anterior y publica los cambios.
+
+    Se llama tras cada refresco del snapshot (listener), una vez por proceso
+    sin importar cuántas pestañas estén conectadas. Cada worker publica a
+    sus propias conexiones; como el snapshot es compartido, los lotes y sus
+    ids (``_live_state``) coinciden entre workers.
+    """
+    global _live_view
+    orders, sections = _pending_lookup()
+    view = {str(o.get("shipment_id") or o["order_id"]): (o["version"], o["category"], o["tiempo_text"]) for o in orders}
+    previous, _live_view = _live_view, view
+    if previous is None:
+        return
+
+    events = []
+    for i, o in enumerate(orders):
+        sid = str(o.get("shipment_id") or o["order_id"])
+        old = previous.get(sid)
+        if old == view[sid]:
+            continue
+        if old is None:
+            kind = "new"
+        elif o["category"] == "delayed" and old[1] != "delayed":
+            kind = "delayed"
+        else:
+            kind = "status"
+        # Posición: antes de la siguiente tarjeta de la misma sección
+        nxt = orders[i + 1] if i + 1 < len(orders) else None
+        before = str(nxt.get("shipment_id") or nxt["order_id"]) if nxt and nxt["category"] == o["category"] else None
+        if o["category"] == "delayed" and (old is None or old[1] != "delayed"):
+            push_dispatcher.notify(o["order_id"], "delayed", f"#{o['order_id']} {o['buyer']} · {o['tiempo_text']}")
+        events.append({
+            "type": kind,
+            "shipment_id": sid,
+            "category": o["category"],
+            "before": before,
+            "html": _render_order_card(o),
+            "detail": _modal_detail(o),
+        })
+    events.extend({"type": "removed", "shipment_id": sid} for sid in previous.keys() - view.keys())
+
+    if events:
+        events.append({
+            "type": "stats",
+            "values": _stats_values(orders),
+            "sections": {category: len(sections.get(category, [])) for _, category in VENTAS_SECTIONS},
+        })
+    live_hub.publish_batch(_live_state(), events)
+
+
+pending_snapshot.add_listener(_publish_ventas_deltas)
+
+
+@router.get("/events")
+async def ventas_events(request: Request, last_id: str | None = None):
+    """Stream SSE con los cambios de /ventas/ (nuevo, cambio de estado, demorado, quitado).
+
+    ``last_id`` (o el header Last-Event-ID al reconectar) es el último evento
+    o estado que la página ya refleja; se le reenvía lo que haya pasado desde
+    entonces, o un ``reset`` para que pida la vista completa.
+    """
+    queue = live_hub.subscribe(request.headers.get("last-event-id") or last_id, _live_state())
+
+    async def stream():
+        nonlocal queue
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event_id, event = await asyncio.wait_for(queue.get(), timeout=LIVE_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                yield sse_message(event_id, event)
+                if queue.empty() and not live_hub.is_subscribed(queue):
+                    # El hub nos soltó por cola llena: la página se resincroniza
+                    # y se sigue desde aquí con una cola nueva
+                    yield sse_message(*live_hub.reset_event(_live_state()))
+                    queue = live_hub.subscribe()
+        finally:
+            live_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/refresh")
+async def ventas_refresh():
+    """Pide un refresco del snapshot; los cambios llegan a las páginas por /ventas/events.
+
+    Si ya hay un refresco en curso (otra pestaña, el scheduler) se espera a ése.
+    """
+    try:
+        await pending_snapshot.refresh()
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=502)
+    return {"version": pending_snapshot.version, "last_event_id": live_hub.state}
+
+
+# ── Detail lookups (modal) ───────────────────────────────────────────────────
+
+# Vista ya enriquecida del snapshot para el modal: por order_id y por
+# shipment_id (órdenes del mismo envío combinadas). Se arma una vez por
+# (versión del snapshot, bucket de etiquetas) y después cada modal es un
+# acceso a dict.
+_detail_view: dict = {"key": None, "orders": {}, "shipments": {}}
+
+
+def _detail_lookup() -> tuple[dict[str, dict], dict[str, dict]]:
+    key = (pending_snapshot.version, label_bucket())
+    if _detail_view["key"] != key:
+        orders = {oid: _enrich_order(entry) for oid, entry in pending_snapshot.by_order.items()}
+        shipments = {}
+        for sid, entries in pending_snapshot.by_shipment.items():
+            first = orders[str(entries[0]["order"].get("id", ""))]
+            base = {**first, "items": list(first["items"])}
+            for entry in entries[1:]:
+                _merge_shipment_order(base, orders[str(entry["order"].get("id", ""))])
+            shipments[sid] = base
+        _detail_view.update(key=key, orders=orders, shipments=shipments)
+    return _detail_view["orders"], _detail_view["shipments"]
+
+
+# Lo que usa el modal: el blob embebido y /api/envios mandan sólo esto
+MODAL_FIELDS = (
+    "order_id", "buyer", "category", "currency", "date_created", "deadline_str", "delivery_str",
+    "logistic", "status_cls", "status_label", "tiempo_cls", "tiempo_text", "total",
+)
+MODAL_ITEM_FIELDS = ("title", "album", "qty", "sku", "unit_price", "thumbnail", "thumb_url")
+ENVIOS_MAX_IDS = 100
+# Envíos fuera del snapshot que una petición de /api/envios trae de ML, y
+# cuántas de esas consultas corren a la vez entre todas las peticiones
+ENVIOS_MAX_FETCH = 10
+ENVIOS_FETCH_CONCURRENCY = 4
+
+# Instancia global
+_envios_fetch_limit = asyncio.Semaphore(ENVIOS_FETCH_CONCURRENCY)
+
+
+def _modal_detail(o: dict) -> dict:
+    detail = {f: o.get(f) for f in MODAL_FIELDS}
+    detail["items"] = [{f: item.get(f) for f in MODAL_ITEM_FIELDS} for item in o["items"]]
+    return detail
+
+
+def _details_blob_html(orders: list[dict]) -> str:
+    """Detalle de los envíos de la página como JSON embebido: el modal abre sin ir al servidor."""
+    details = {str(o.get("shipment_id") or o["order_id"]): _modal_detail(o) for o in orders}
+    data = json.dumps(details, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return f'<script type="application/json" id="shipment-details">{data}</script>'
+
+
+@router.get("/api/cards")
+async def ventas_cards_api(category: str, cursor: str | None = None, limit: int = SECTION_PAGE_SIZE):
+    """Siguiente página de tarjetas de una sección de /ventas/ (scroll infinito).
+
+    ``cursor`` es el ``data-next`` del final de la sección; la respuesta trae
+    el HTML de las tarjetas, su detalle para el modal y el cursor siguiente.
+    """
+    if category not in CATEGORY_ORDER:
+        return JSONResponse({"error": "category inválida"}, status_code=400)
+    if not 1 <= limit <= API_MAX_LIMIT:
+        return JSONResponse({"error": f"limit debe estar entre 1 y {API_MAX_LIMIT}"}, status_code=400)
+    try:
+        after = _decode_card_cursor(cursor) if cursor else None
+    except ValueError:
+        return JSONResponse({"error": "cursor inválido"}, status_code=400)
+    try:
+        await pending_snapshot.get()
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    orders = _pending_lookup()[1].get(category, [])
+    start = bisect.bisect_right(orders, after, key=_card_key) if after else 0
+    page = orders[start:start + limit]
+    return JSONResponse({
+        "html": "".join(_render_order_card(o) for o in page),
+        "details": {str(o.get("shipment_id") or o["order_id"]): _modal_detail(o) for o in page},
+        "next_cursor": _encode_card_cursor(page[-1]) if start + limit < len(orders) else None,
+        "total": len(orders),
+    })
+
+
+@router.get("/api/envios")
+async def ventas_envios_api(ids: str = ""):
+    """Detalle compacto de varios envíos a la vez (precarga del modal al pasar el mouse).
+
+    ``ids`` separados por coma; los que no están en el snapshot se traen de ML
+    (hasta ``ENVIOS_MAX_FETCH`` por petición; el resto va en ``skipped`` para
+    pedirlos después). Los que no existen simplemente no aparecen.
+    """
+    wanted = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not wanted or len(wanted) > ENVIOS_MAX_IDS or not all(i.isdigit() for i in wanted):
+        return JSONResponse({"error": f"ids inválidos (hasta {ENVIOS_MAX_IDS}, separados por coma)"}, status_code=400)
+    try:
+        await pending_snapshot.get()
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    shipments = _detail_lookup()[1]
+    details = {sid: _modal_detail(shipments[sid]) for sid in wanted if sid in shipments}
+    missing = [sid for sid in wanted if sid not in details]
+    missing, skipped = missing[:ENVIOS_MAX_FETCH], missing[ENVIOS_MAX_FETCH:]
+
+    async def fetch(sid: str) -> dict:
+        async with _envios_fetch_limit:
+            return await meli.get_shipment_entry(sid)
+
+    if missing:
+        fetched = await asyncio.gather(*(fetch(sid) for sid in missing), return_exceptions=True)
+        for sid, entry in zip(missing, fetched):
+            if not isinstance(entry, Exception):
+                details[sid] = _modal_detail(_enrich_order(entry))
+    return JSONResponse({"shipments": details, "skipped": skipped}, headers={"Cache-Control": "no-cache"})
 
 
 @router.get("/api/orden/{order_id}")
@@ -511,47 +962,17 @@ async def ventas_orden_api(order_id: str):
     if not order_id.isdigit():
         return JSONResponse({"error": "order_id inválido"}, status_code=400)
     try:
-        data = await meli.get_pending_shipments()
+        await pending_snapshot.get()
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
-    # Buscar la orden en los datos
-    for item in data:
-        oid = str(item["order"].get("id", ""))
-        if oid == order_id:
-            enriched = _enrich_order(item)
-            return JSONResponse(enriched)
+    enriched = _detail_lookup()[0].get(order_id)
+    if enriched is not None:
+        return JSONResponse(enriched)
 
-    # No estaba en cache; intentar fetch directo
+    # No está en el snapshot: traer sólo esa orden
     try:
-        order_data = await meli.get_order(order_id)
-        shipping_id = order_data.get("shipping", {}).get("id")
-        shipment_data = None
-        if shipping_id:
-            try:
-                shipment_data = await meli.get_shipment(str(shipping_id))
-            except Exception:
-                pass
-
-        # Fetch thumbnails para los items
-        item_ids = [
-            str(oi.get("item", {}).get("id", ""))
-            for oi in order_data.get("order_items", [])
-            if oi.get("item", {}).get("id")
-        ]
-        thumbnails = await meli.get_items_thumbnails(item_ids) if item_ids else {}
-        for oi in order_data.get("order_items", []):
-            item_obj = oi.get("item")
-            if isinstance(item_obj, dict):
-                item_obj["thumbnail"] = thumbnails.get(str(item_obj.get("id", "")), "")
-
-        synthetic = {
-            "order": order_data,
-            "shipment": shipment_data,
-            "shipment_id": shipping_id,
-        }
-        enriched = _enrich_order(synthetic)
-        return JSONResponse(enriched)
+        return JSONResponse(_enrich_order(await meli.get_order_entry(order_id)))
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=404)
 
@@ -560,7 +981,7 @@ async def ventas_orden_api(order_id: str):
 async def ventas_debug():
     """Muestra el shipment COMPLETO de ML para ver todas las fechas disponibles."""
     try:
-        data = await meli.get_pending_shipments()
+        data = await pending_snapshot.get()
     except Exception as e:
         return {"error": str(e)}
 
@@ -604,48 +1025,19 @@ async def ventas_envio_api(shipment_id: str):
     if not shipment_id.isdigit():
         return JSONResponse({"error": "shipment_id inválido"}, status_code=400)
     try:
-        data = await meli.get_pending_shipments()
+        await pending_snapshot.get()
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
-    # Juntar todas las órdenes que pertenecen a este shipment
-    matching = [
-        item for item in data
-        if str(item.get("shipment_id", "")) == shipment_id
-    ]
-
-    if not matching:
-        # Fallback: fetch directo del shipment y su primera orden
-        try:
-            shipment_data = await meli.get_shipment(shipment_id)
-            # Buscar órdenes asociadas al shipment
-            order_ids = []
-            for item in data:
-                if str(item.get("shipment_id", "")) == shipment_id:
-                    order_ids.append(str(item["order"].get("id", "")))
-            if not order_ids:
-                return JSONResponse({"error": "Envío no encontrado"}, status_code=404)
-        except Exception as e:
-            return JSONResponse({"error": str(e)}, status_code=404)
-
-    if len(matching) == 1:
-        enriched = _enrich_order(matching[0])
+    enriched = _detail_lookup()[1].get(shipment_id)
+    if enriched is not None:
         return JSONResponse(enriched)
 
-    # Combinar múltiples órdenes del mismo envío
-    CAT_PRIORITY = {"delayed": 0, "ready": 1, "pending": 2, "shipped": 3, "other": 4}
-    base = _enrich_order(matching[0])
-    for item in matching[1:]:
-        extra = _enrich_order(item)
-        base["items"].extend(extra["items"])
-        base["total"] += extra["total"]
-        if CAT_PRIORITY.get(extra["category"], 99) < CAT_PRIORITY.get(base["category"], 99):
-            base["category"] = extra["category"]
-            base["status_label"] = extra["status_label"]
-            base["status_cls"] = extra["status_cls"]
-            base["tiempo_text"] = extra["tiempo_text"]
-            base["tiempo_cls"] = extra["tiempo_cls"]
-    return JSONResponse(base)
+    # No está en el snapshot: traer el envío y su orden
+    try:
+        return JSONResponse(_enrich_order(await meli.get_shipment_entry(shipment_id)))
+    except Exception as e:
+        return JSONResponse({"error": "Envío no encontrado", "detail": str(e)}, status_code=404)
 
 
 @router.get("/etiqueta/{shipment_id}")
@@ -659,32 +1051,201 @@ async def get_etiqueta(shipment_id: str):
     )
 
 
+# ── JSON API ─────────────────────────────────────────────────────────────────
+
+API_MAX_LIMIT = 500
+
+# Campos de cada pedido en /ventas/api. Sin paginación ni ``fields`` la
+# respuesta conserva la forma original: sólo LEGACY_FIELDS y en el orden del
+# snapshot.
+API_FIELDS = (
+    "order_id", "shipment_id", "buyer", "items", "total", "currency", "status", "category",
+    "deadline", "delivery_date", "logistic_type", "date_created", "last_updated",
+)
+LEGACY_FIELDS = tuple(f for f in API_FIELDS if f not in ("shipment_id", "last_updated"))
+
+# Filas de /ventas/api ordenadas de la más reciente a la más vieja, con
+# índices (posiciones en ``rows``) por categoría y tipo logístico, y
+# ``legacy``: las mismas posiciones en el orden del snapshot. Se arman una
+# vez por (versión del snapshot, bucket de etiquetas).
+_api_view: dict = {
+    "key": None, "rows": [], "keys": [], "updated": [], "by_category": {}, "by_logistic": {}, "legacy": [],
+}
+
+
+def _api_row(o: dict, entry: dict) -> tuple[dict, int | None]:
+    """Fila de /ventas/api y su última actualización (epoch) para ``since``."""
+    shipment = entry.get("shipment") or {}
+    updated = [
+        (ts, date_str)
+        for date_str in (entry["order"].get("last_updated"), shipment.get("last_updated"))
+        if (ts := _to_ts(date_str)) is not None
+    ]
+    updated_ts, last_updated = max(updated) if updated else (None, None)
+    return {
+        "order_id": o["order_id"],
+        "shipment_id": o.get("shipment_id"),
+        "buyer": o["buyer"],
+        "items": o["items"],
+        "total": o["total"],
+        "currency": o["currency"],
+        "status": o["status_label"],
+        "category": o["category"],
+        "deadline": o["deadline_str"],
+        "delivery_date": o["delivery_str"],
+        "logistic_type": o["logistic"],
+        "date_created": o["date_created"],
+        "last_updated": last_updated,
+    }, updated_ts
+
+
+def _api_lookup() -> dict:
+    key = (pending_snapshot.version, label_bucket())
+    if _api_view["key"] == key:
+        return _api_view
+    enriched = _detail_lookup()[0]
+    entries = []
+    for oid, entry in pending_snapshot.by_order.items():
+        shipment = entry.get("shipment")
+        if shipment and shipment.get("status") in ("delivered", "cancelled"):
+            continue
+        o = enriched[oid]
+        row, updated_ts = _api_row(o, entry)
+        entries.append(((-(o["created_ts"] or 0), -int(o["order_id"] or 0)), row, updated_ts))
+
+    # El sort es estable: ``order`` guarda la posición de cada fila en el snapshot
+    order = sorted(range(len(entries)), key=lambda i: entries[i][0])
+    legacy = [0] * len(entries)
+    for position, i in enumerate(order):
+        legacy[i] = position
+    entries = [entries[i] for i in order]
+    rows = [e[1] for e in entries]
+    by_category: dict[str, list[int]] = {}
+    by_logistic: dict[str, list[int]] = {}
+    for i, row in enumerate(rows):
+        by_category.setdefault(row["category"], []).append(i)
+        by_logistic.setdefault(row["logistic_type"] or "", []).append(i)
+    _api_view.update(
+        key=key, rows=rows, keys=[e[0] for e in entries], updated=[e[2] for e in entries],
+        by_category=by_category, by_logistic=by_logistic, legacy=legacy,
+    )
+    return _api_view
+
+
+def _encode_cursor(sort_key: tuple) -> str:
+    return f"{-sort_key[0]}_{-sort_key[1]}"
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    ts, _, oid = cursor.partition("_")
+    return (-int(ts), -int(oid))
+
+
+def _positions(index: dict[str, list[int]], values: str | None) -> list[int] | None:
+    """Posiciones que cumplen un filtro ``a,b,c`` (None = sin filtro)."""
+    if values is None:
+        return None
+    wanted = [v.strip() for v in values.split(",") if v.strip()]
+    if len(wanted) == 1:
+        return index.get(wanted[0], [])
+    return sorted(set().union(*(index.get(v, []) for v in wanted)))
+
+
 @router.get("/api")
-async def ventas_api():
-    """JSON de todas las ventas pendientes."""
+async def ventas_api(
+    request: Request,
+    category: str | None = None,
+    logistic_type: str | None = None,
+    since: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    """JSON de las ventas pendientes.
+
+    Filtros opcionales (se combinan):
+    - ``category``: delayed, ready, pending, shipped u other (varias separadas por coma)
+    - ``logistic_type``: p. ej. ``fulfillment,xd_drop_off``
+    - ``since``: ISO 8601; sólo pedidos cuya orden o envío cambió desde entonces
+    - ``limit`` / ``cursor``: página de hasta ``limit`` pedidos; ``next_cursor``
+      de la respuesta pide la siguiente
+    - ``fields``: proyección, p. ej. ``order_id,category,status``
+
+    Con ``limit``, ``cursor`` o ``fields`` los pedidos van de la más reciente
+    a la más vieja, con ``shipment_id`` y ``last_updated``, y la respuesta
+    agrega ``count`` y ``next_cursor``. Sin ellos responde como siempre: en el
+    orden del snapshot, con los campos originales y sólo ``total_pending`` y
+    ``orders``.
+    """
+    projection = None
+    if fields is not None:
+        projection = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in projection if f not in API_FIELDS]
+        if unknown or not projection:
+            return JSONResponse(
+                {"error": f"Campos desconocidos: {', '.join(unknown) or '(vacío)'}"}, status_code=422
+            )
+    since_ts = None
+    if since is not None:
+        since_ts = _to_ts(since)
+        if since_ts is None:
+            return JSONResponse({"error": "since inválido (usa ISO 8601)"}, status_code=400)
+    if limit is not None and not 1 <= limit <= API_MAX_LIMIT:
+        return JSONResponse({"error": f"limit debe estar entre 1 y {API_MAX_LIMIT}"}, status_code=400)
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return JSONResponse({"error": "cursor inválido"}, status_code=400)
+
     try:
-        data = await meli.get_pending_shipments()
+        await pending_snapshot.get()
     except Exception as e:
         return {"error": str(e)}
 
-    pending = []
-    for item in data:
-        shipment = item.get("shipment")
-        if shipment and shipment.get("status") in ("delivered", "cancelled"):
+    etag = make_etag("ventas-api", pending_snapshot.digest, label_bucket())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    view = _api_lookup()
+    rows, keys, updated = view["rows"], view["keys"], view["updated"]
+    if limit is None and cursor is None and projection is None:
+        # Forma original: orden del snapshot; los filtros se aplican igual
+        selected = [set(p) for p in (_positions(view["by_category"], category),
+                                     _positions(view["by_logistic"], logistic_type)) if p is not None]
+        page = [
+            {f: rows[i][f] for f in LEGACY_FIELDS}
+            for i in view["legacy"]
+            if all(i in s for s in selected)
+            and (since_ts is None or (updated[i] is not None and updated[i] >= since_ts))
+        ]
+        return JSONResponse({"total_pending": len(rows), "orders": page}, headers=cache_headers(etag))
+
+    # Recorrer sólo las posiciones del índice más chico; el otro filtro es un set
+    candidates = [p for p in (_positions(view["by_category"], category),
+                              _positions(view["by_logistic"], logistic_type)) if p is not None]
+    candidates.sort(key=len)
+    positions = candidates[0] if candidates else range(len(rows))
+    others = [set(p) for p in candidates[1:]]
+
+    start = bisect.bisect_right(keys, after) if after else 0
+    page = []
+    next_cursor = None
+    for i in positions[bisect.bisect_left(positions, start):]:
+        if any(i not in other for other in others):
             continue
-        o = _enrich_order(item)
-        pending.append({
-            "order_id": o["order_id"],
-            "buyer": o["buyer"],
-            "items": o["items"],
-            "total": o["total"],
-            "currency": o["currency"],
-            "status": o["status_label"],
-            "category": o["category"],
-            "deadline": o["deadline_str"],
-            "delivery_date": o["delivery_str"],
-            "logistic_type": o["logistic"],
-            "date_created": o["date_created"],
-        })
-
-    return {"total_pending": len(pending), "orders": pending}
+        if since_ts is not None and (updated[i] is None or updated[i] < since_ts):
+            continue
+        row = rows[i]
+        if limit is not None and len(page) == limit:
+            next_cursor = _encode_cursor(keys[page_last])
+            break
+        page.append(row)
+        page_last = i
+
+    if projection is not None:
+        page = [{f: row[f] for f in projection} for row in page]
+
+    return JSONResponse(
+        {"total_pending": len(rows), "count": len(page), "next_cursor": next_cursor, "orders": page},
+        headers=cache_headers(etag),
+    )
@@ -0,0 +1,195 @@
+"""Ventas por producto en ventanas de tiempo deslizantes (1h, 24h, 7d…).
+
+Cada ventana es un anillo de ``buckets`` contadores de igual duración; al
+avanzar el reloj se ponen en cero los buckets que salieron de la ventana.
+Sumar una venta y leer el total son O(1) amortizado y la memoria por
+producto es fija, sin importar cuántas órdenes se hayan visto: consultar la
+velocidad de venta cuesta O(productos).
+
+La precisión es de un bucket: una venta puede dejar de contar hasta
+``ventana / buckets`` antes de salir de la ventana.
+"""
+import heapq
+import math
+import re
+import time
+from app.models import Order
+
+_DURATION = re.compile(r"^(\d+)([smhd])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_windows(spec: str) -> dict[str, int]:
+    """``"1h,24h,7d"`` -> ``{"1h": 3600, "24h": 86400, "7d": 604800}``."""
+    windows = {}
+    for part in spec.split(","):
+        part = part.strip()
+        m = _DURATION.match(part)
+        if not m:
+            raise ValueError(f"Ventana inválida: {part!r}")
+        windows[part] = int(m.group(1)) * _UNIT_SECONDS[m.group(2)]
+    return windows
+
+
+class RollingCounter:
+    """Suma de una ventana deslizante en un anillo de buckets fijos."""
+
+    __slots__ = ("bucket_seconds", "counts", "head", "total")
+
+    def __init__(self, window_seconds: float, buckets: int):
+        self.bucket_seconds = window_seconds / buckets
+        self.counts = [0] * buckets
+        self.head = 0  # índice absoluto del bucket más reciente
+        self.total = 0
+
+    def _advance(self, index: int) -> None:
+        if index <= self.head:
+            return
+        size = len(self.counts)
+        if index - self.head >= size:
+            self.counts = [0] * size
+            self.total = 0
+        else:
+            for i in range(self.head + 1, index + 1):
+                self.total -= self.counts[i % size]
+                self.counts[i % size] = 0
+        self.head = index
+
+    def add(self, amount: int, at: float, now: float) -> None:
+        """Suma ``amount`` en el bucket de ``at``; se ignora si ya salió de la ventana."""
+        self._advance(math.floor(now / self.bucket_seconds))
+        index = min(math.floor(at / self.bucket_seconds), self.head)
+        if self.head - index >= len(self.counts):
+            return
+        self.counts[index % len(self.counts)] += amount
+        self.total += amount
+
+    def value(self, now: float) -> int:
+        """Total a ``now`` sin modificar el anillo (se lee desde el threadpool)."""
+        stale = math.floor(now / self.bucket_seconds) - self.head
+        if stale <= 0:
+            return self.total
+        size = len(self.counts)
+        if stale >= size:
+            return 0
+        return self.total - sum(self.counts[(self.head + i) % size] for i in range(1, stale + 1))
+
+
+class SalesCounters:
+    """Unidades vendidas por producto (item_id) y por SKU en cada ventana.
+
+    Se alimenta con ``record(order)`` cada vez que se ve una orden; cada
+    orden cuenta una sola vez (por order_id) en el momento de su venta
+    (``date_created``). Si después llega cancelada se resta. Las órdenes más
+    viejas que la ventana más larga se ignoran y se olvidan, igual que los
+    productos y SKUs cuya última venta ya salió de todas las ventanas.
+
+    Sólo ``record`` modifica la estructura; ``velocity`` únicamente lee.
+    """
+
+    def __init__(self, windows: dict[str, int], buckets: int):
+        self.windows = windows
+        self.buckets = buckets
+        self.horizon = max(windows.values())
+        # Una venta deja de contar hasta un bucket después de salir de la ventana
+        self._idle_after = self.horizon + self.horizon / buckets
+        self.items: dict[str, dict[str, RollingCounter]] = {}
+        self.skus: dict[str, dict[str, RollingCounter]] = {}
+        self.titles: dict[str, tuple[str, str | None]] = {}
+        # order_id -> si sigue contando (False: se restó por cancelada)
+        self._seen: dict[int, bool] = {}
+        self._expiry: list[tuple[float, int]] = []
+        # (tabla, llave) -> fecha de su venta más reciente, y heap para olvidar
+        # las llaves sin ventas en ninguna ventana
+        self._last_sale: dict[tuple[str, str], float] = {}
+        self._idle: list[tuple[float, str, str]] = []
+
+    def _counters(self, table: dict, key: str) -> dict[str, RollingCounter]:
+        counters = table.get(key)
+        if counters is None:
+            counters = table[key] = {
+                name: RollingCounter(seconds, self.buckets) for name, seconds in self.windows.items()
+            }
+        return counters
+
+    def _touch(self, table: str, key: str, at: float) -> None:
+        if at > self._last_sale.get((table, key), -math.inf):
+            self._last_sale[(table, key)] = at
+            heapq.heappush(self._idle, (at, table, key))
+
+    def _add(self, order: Order, at: float, sign: int, now: float) -> None:
+        for item in order.items:
+            amount = sign * item.quantity
+            for counter in self._counters(self.items, item.item_id).values():
+                counter.add(amount, at, now)
+            if item.sku:
+                for counter in self._counters(self.skus, item.sku).values():
+                    counter.add(amount, at, now)
+            if sign > 0:
+                self._touch("item", item.item_id, at)
+                if item.sku:
+                    self._touch("sku", item.sku, at)
+                # Una venta sin SKU no borra el que ya se conocía
+                known_sku = self.titles.get(item.item_id, ("", None))[1]
+                self.titles[item.item_id] = (item.title, item.sku or known_sku)
+
+    def record(self, order: Order, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        at = order.date_created.timestamp()
+        if now - at > self.horizon:
+            self._prune(now)
+            return
+        cancelled = order.status == "cancelled"
+        seen = self._seen.get(order.order_id)
+        if seen is None and not cancelled:
+            self._seen[order.order_id] = True
+            heapq.heappush(self._expiry, (at, order.order_id))
+            self._add(order, at, 1, now)
+        elif seen and cancelled:
+            # Se queda en _seen como False: no vuelve a contar
+            self._seen[order.order_id] = False
+            self._add(order, at, -1, now)
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        """Olvida order_ids fuera de la ventana más larga (ya no pueden contar)
+        y los productos/SKUs cuya última venta ya no cuenta en ninguna ventana."""
+        while self._expiry and now - self._expiry[0][0] > self.horizon:
+            _, order_id = heapq.heappop(self._expiry)
+            self._seen.pop(order_id, None)
+        while self._idle and now - self._idle[0][0] > self._idle_after:
+            at, table, key = heapq.heappop(self._idle)
+            if self._last_sale.get((table, key)) != at:
+                continue  # entrada vieja: la llave tuvo una venta después
+            del self._last_sale[(table, key)]
+            if table == "sku":
+                self.skus.pop(key, None)
+            else:
+                self.items.pop(key, None)
+                self.titles.pop(key, None)
+
+    def velocity(self, by: str = "item", now: float | None = None) -> list[dict]:
+        """Unidades por producto (``by="item"``) o por SKU en cada ventana.
+
+        Ordenado de mayor a menor por la ventana más corta (y la siguiente
+        para desempatar); los productos sin ventas en ninguna ventana no
+        aparecen.
+        """
+        now = time.time() if now is None else now
+        table = self.skus if by == "sku" else self.items
+        by_length = sorted(self.windows, key=self.windows.get)
+        rows = []
+        # Copias: record() puede agregar llaves mientras tanto desde el loop
+        for key, counters in list(table.items()):
+            sold = {name: counter.value(now) for name, counter in list(counters.items())}
+            if not any(sold.values()):
+                continue
+            if by == "sku":
+                row = {"sku": key}
+            else:
+                title, sku = self.titles.get(key, ("", None))
+                row = {"item_id": key, "title": title, "sku": sku}
+            row["sold"] = sold
+            rows.append(row)
+        rows.sort(key=lambda r: [r["sold"][name] for name in by_length], reverse=True)
+        return rows
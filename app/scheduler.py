@@ -1,25 +1,211 @@
 import asyncio
+import logging
+import os
+import random
+import socket
+import time
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from app.config import settings
+from app.ip_allowlist import ip_access
 from app.order_manager import order_manager
+from app.push import push_dispatcher
+from app.reconciler import reconciler
+from app.snapshot import pending_snapshot
+from app.state import state_backend
 
+logger = logging.getLogger(__name__)
 
-async def auto_cleanup_loop():
-    """Cada 30 minutos limpia órdenes completadas automáticamente."""
-    while True:
+
+@dataclass
+class Job:
+    """Tarea periódica registrada en el scheduler, con sus métricas."""
+
+    name: str
+    func: Callable[[], Awaitable]
+    interval: float
+    jitter: float = 0.0
+    timeout: float | None = None
+    run_at_start: bool = False
+    # Sólo la corre el worker que tiene el lease del job; los demás corren
+    # ``follower`` (si hay) en su lugar
+    leader_only: bool = False
+    follower: Callable[[], Awaitable] | None = None
+
+    running: bool = False
+    leader: bool = False
+    standby: int = 0
+    runs: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    skipped: int = 0
+    last_run: float | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+
+    def status(self) -> dict:
+        return {
+            "interval": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "leader": self.leader,
+            "standby": self.standby,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+
+class JobScheduler:
+    """Corre tareas periódicas en segundo plano, cada una en su propio loop.
+
+    Cada job tiene su intervalo, un jitter aleatorio para no sincronizar
+    llamadas a ML entre jobs o workers, timeout opcional y protección contra
+    ejecuciones solapadas (una corrida manual con ``trigger`` mientras el
+    loop la está corriendo se descarta y se cuenta como ``skipped``).
+
+    Los jobs ``leader_only`` (los que consultan ML) se coordinan entre
+    workers con un lease en el backend de estado: lo renueva quien lo tiene
+    en cada corrida y, si ese worker muere, otro lo toma al vencer.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        jitter: float = 0.0,
+        timeout: float | None = None,
+        run_at_start: bool = False,
+        leader_only: bool = False,
+        follower: Callable[[], Awaitable] | None = None,
+    ) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job duplicado: {name!r}")
+        job = Job(name, func, interval, jitter, timeout, run_at_start, leader_only, follower)
+        self.jobs[name] = job
+        return job
+
+    async def run_job(self, job: Job) -> bool:
+        """Ejecuta el job una vez. Regresa False si ya estaba corriendo."""
+        if job.running:
+            job.skipped += 1
+            return False
+        func = job.func
+        if job.leader_only:
+            # El lease dura más que una corrida completa más la espera a la siguiente
+            ttl = 2 * job.interval + job.jitter + (job.timeout or job.interval)
+            try:
+                job.leader = state_backend.acquire_lease(f"job:{job.name}", self.worker_id, ttl)
+            except Exception as exc:
+                logger.warning("[Scheduler] No se pudo tomar el lease de %s: %s", job.name, exc)
+                job.leader = False
+            if not job.leader:
+                job.standby += 1
+                if job.follower is None:
+                    return True
+                func = job.follower
+        job.running = True
+        start = time.monotonic()
+        job.last_run = time.time()
         try:
-            removed = await order_manager.cleanup_completed()
-            if removed:
-                print(f"[Auto-cleanup] Se eliminaron {len(removed)} órdenes completadas: {removed}")
+            if job.timeout:
+                await asyncio.wait_for(func(), job.timeout)
+            else:
+                await func()
+            job.last_error = None
+        except asyncio.TimeoutError:
+            job.timeouts += 1
+            job.errors += 1
+            job.last_error = f"timeout tras {job.timeout}s"
+            logger.warning("[Scheduler] Job %s excedió %ss", job.name, job.timeout)
         except Exception as exc:
-            print(f"[Auto-cleanup] Error durante cleanup: {exc}")
-        await asyncio.sleep(1800)  # 30 minutos
+            job.errors += 1
+            job.last_error = str(exc)
+            logger.warning("[Scheduler] Error en job %s: %s", job.name, exc)
+        finally:
+            job.runs += 1
+            job.last_duration = time.monotonic() - start
+            job.running = False
+        return True
+
+    async def trigger(self, name: str) -> bool:
+        return await self.run_job(self.jobs[name])
+
+    async def _loop(self, job: Job) -> None:
+        if not job.run_at_start:
+            await asyncio.sleep(job.interval + random.uniform(0, job.jitter))
+        while True:
+            await self.run_job(job)
+            await asyncio.sleep(job.interval + random.uniform(0, job.jitter))
+
+    def start(self) -> None:
+        for name, job in self.jobs.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._loop(job), name=f"job:{name}")
+
+    async def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def status(self) -> dict:
+        return {name: job.status() for name, job in self.jobs.items()}
+
+
+async def evict_completed_job():
+    """Elimina las órdenes completadas cuyo periodo de gracia ya venció."""
+    removed = await order_manager.evict_expired()
+    if removed:
+        print(f"[Expiry] Se eliminaron {len(removed)} órdenes completadas: {removed}")
+
+
+# Instancia global
+scheduler = JobScheduler()
+scheduler.add_job("expiry", evict_completed_job, interval=15)
+scheduler.add_job(
+    "snapshot",
+    pending_snapshot.refresh,
+    interval=settings.SNAPSHOT_REFRESH_SECONDS,
+    jitter=5,
+    timeout=120,
+    run_at_start=True,
+    leader_only=True,
+    follower=pending_snapshot.sync_shared,
+)
+scheduler.add_job(
+    "reconcile",
+    reconciler.run,
+    interval=settings.RECONCILE_INTERVAL_SECONDS,
+    jitter=30,
+    timeout=240,
+    leader_only=True,
+)
+
+scheduler.add_job(
+    "allowlist",
+    ip_access.reload_if_changed,
+    interval=settings.ALLOWED_IPS_RELOAD_SECONDS,
+    timeout=10,
+)
 
 
 @asynccontextmanager
 async def lifespan(app):
     """Inicia tareas en segundo plano al arrancar la app."""
-    task = asyncio.create_task(auto_cleanup_loop())
-    print("[Startup] Auto-cleanup de órdenes iniciado")
+    scheduler.start()
+    print(f"[Startup] Scheduler iniciado con jobs: {', '.join(scheduler.jobs)}")
     yield
-    task.cancel()
-    print("[Shutdown] Auto-cleanup detenido")
+    await scheduler.stop()
+    await push_dispatcher.stop()
+    print("[Shutdown] Scheduler detenido")
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Callable
+from app.config import settings
+from app.meli_client import meli
+from app.state import state_backend
+
+logger = logging.getLogger(__name__)
+
+
+def entry_version(entry: dict) -> tuple:
+    """Lo que identifica una versión de un pedido: si cambia, cambió el pedido."""
+    order = entry["order"]
+    shipment = entry.get("shipment") or {}
+    return (
+        order.get("id"),
+        order.get("last_updated"),
+        order.get("status"),
+        entry.get("shipment_id"),
+        shipment.get("last_updated"),
+        shipment.get("status"),
+        shipment.get("substatus"),
+    )
+
+
+def _index_entries(data: list[dict]) -> tuple[dict[str, dict], dict[str, list[dict]]]:
+    by_order: dict[str, dict] = {}
+    by_shipment: dict[str, list[dict]] = {}
+    for entry in data:
+        by_order[str(entry["order"].get("id", ""))] = entry
+        if entry.get("shipment_id"):
+            by_shipment.setdefault(str(entry["shipment_id"]), []).append(entry)
+    return by_order, by_shipment
+
+
+class PendingSnapshot:
+    """Última copia de ``meli.get_pending_shipments()``.
+
+    El job "snapshot" del scheduler la refresca en segundo plano, así que
+    las páginas normalmente la leen sin tocar ML. ``version`` sólo avanza
+    cuando el contenido cambia, no en cada refresco; ``digest`` es un hash
+    estable del contenido (igual entre workers y reinicios) para ETags.
+
+    Varias peticiones que piden refrescar a la vez comparten una sola
+    sincronización con ML. ``by_order`` / ``by_shipment`` indexan las
+    entradas para buscar un pedido o envío sin recorrer la lista. Los
+    listeners (``add_listener``) se llaman tras cada refresco exitoso con
+    los datos nuevos.
+
+    Cada refresco se guarda en el backend de estado. Con varios workers sólo
+    el líder corre el job contra ML; los demás cargan esa copia
+    (``load_shared``) y sólo van a ML si está más vieja que ``max_age``.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.data: list[dict] | None = None
+        self.version = 0
+        self.fetched_at = 0.0
+        self.digest = ""
+        self.by_order: dict[str, dict] = {}
+        self.by_shipment: dict[str, list[dict]] = {}
+        self._inflight: asyncio.Task | None = None
+        self._listeners: list[Callable[[list[dict]], None]] = []
+
+    def add_listener(self, listener: Callable[[list[dict]], None]) -> None:
+        self._listeners.append(listener)
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.data is not None and time.time() - self.fetched_at < self.max_age
+
+    def _apply(self, data: list[dict], digest: str, fetched_at: float) -> None:
+        if digest != self.digest:
+            self.digest = digest
+            self.version += 1
+        self.by_order, self.by_shipment = _index_entries(data)
+        self.data = data
+        self.fetched_at = fetched_at
+        for listener in self._listeners:
+            try:
+                listener(data)
+            except Exception:
+                logger.exception("Listener de snapshot falló")
+
+    async def _fetch(self) -> list[dict]:
+        data = await meli.get_pending_shipments()
+        versions = repr([entry_version(entry) for entry in data]).encode()
+        digest = hashlib.blake2b(versions, digest_size=8).hexdigest()
+        changed = digest != self.digest
+        self._apply(data, digest, time.time())
+        try:
+            state_backend.put_snapshot(digest, self.fetched_at, json.dumps(data) if changed else None)
+        except Exception as exc:
+            logger.warning("No se pudo compartir el snapshot: %s", exc)
+        return data
+
+    def load_shared(self) -> bool:
+        """Carga el snapshot que otro worker guardó, si es más nuevo que el propio."""
+        row = state_backend.get_snapshot(self.fetched_at, self.digest)
+        if row is None:
+            return False
+        digest, fetched_at, data = row
+        self._apply(self.data if data is None else json.loads(data), digest, fetched_at)
+        return True
+
+    async def sync_shared(self) -> None:
+        """Job de los workers que no son líder: sólo leen la copia compartida."""
+        self.load_shared()
+
+    async def refresh(self) -> list[dict]:
+        """Trae datos nuevos de ML, o espera al refresco que ya esté en curso."""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        # shield: si se cancela una petición, el refresco compartido sigue
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task) -> None:
+        if self._inflight is task:
+            self._inflight = None
+
+    async def get(self) -> list[dict]:
+        """Datos vigentes; sólo va a ML si la copia es más vieja que ``max_age``.
+
+        Si el refresco falla pero hay una copia anterior, regresa esa copia.
+        """
+        if self.is_fresh:
+            return self.data
+        if self.load_shared() and self.is_fresh:
+            return self.data
+        try:
+            return await self.refresh()
+        except Exception as exc:
+            if self.data is None:
+                raise
+            logger.warning("Refresco de snapshot falló, usando copia de hace %.0fs: %s",
+                           time.time() - self.fetched_at, exc)
+            return self.data
+
+
+# Instancia global
+pending_snapshot = PendingSnapshot(max_age=settings.SNAPSHOT_MAX_AGE_SECONDS)
@@ -0,0 +1,413 @@
+"""Backends de estado compartido para OrderManager y los tokens de ML.
+
+Con un solo proceso basta MemoryBackend. Para correr uvicorn con
+``--workers N`` se usa SQLiteBackend: órdenes y tokens viven en un archivo
+que comparten todos los workers, y cada escritura incrementa un contador de
+versión que los demás procesos comparan para saber cuándo resincronizar.
+
+Con varios workers, las tareas que consultan ML (snapshot, reconciliación)
+corren sólo en el que tiene el lease (``acquire_lease``); el snapshot que
+trae se guarda con ``put_snapshot`` y los demás lo leen con
+``get_snapshot`` en vez de pedirlo a ML.
+
+Los avisos push también se coordinan aquí: ``claim_once`` decide qué
+worker avisa de un (pedido, tipo) y las suscripciones Web Push se guardan
+con ``put_push_subscription`` para que todos los workers las vean.
+
+Cada escritura deja además un evento en una bitácora acotada de cambios
+(``changes_since``), que sirve tanto a los clientes del change feed como a
+los workers para resincronizar sin recargar todo.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+from app.config import settings
+from app.models import Order
+
+
+CHANGE_TYPES = ("added", "updated", "removed", "priority_changed")
+
+
+def _change(version: int, change_type: str, order_id: int, order: Order | None, at: float) -> dict:
+    return {"version": version, "type": change_type, "order_id": order_id, "order": order, "at": at}
+
+
+class StateBackend:
+    """Interfaz común de los backends de estado.
+
+    Cada escritura de órdenes regresa la nueva versión global; quien escribe
+    puede detectar así si otro worker escribió en medio (la versión salta
+    más de 1) y recargar.
+
+    Los eventos de cambio son dicts ``{version, type, order_id, order, at}``;
+    ``order`` es None en los eventos "removed".
+
+    ``instance_id`` identifica el almacenamiento: junto con la versión forma
+    un identificador que no se repite aunque el contador vuelva a empezar.
+    """
+
+    instance_id = ""
+
+    def version(self) -> int:
+        raise NotImplementedError
+
+    def load_orders(self) -> tuple[int, dict[int, Order]]:
+        """Regresa (versión, órdenes) leídos de forma consistente."""
+        raise NotImplementedError
+
+    def put_order(self, order: Order, change_type: str = "updated") -> int:
+        raise NotImplementedError
+
+    def delete_order(self, order_id: int) -> int:
+        raise NotImplementedError
+
+    def changes_since(self, version: int) -> list[dict] | None:
+        """Eventos con versión mayor a ``version``, en orden.
+
+        Regresa None si esos eventos ya salieron de la bitácora y hace falta
+        una recarga completa.
+        """
+        raise NotImplementedError
+
+    def get_tokens(self) -> tuple[str, str]:
+        """Regresa (access_token, refresh_token)."""
+        raise NotImplementedError
+
+    def set_tokens(self, access_token: str, refresh_token: str) -> None:
+        raise NotImplementedError
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Toma o renueva el lease ``name`` por ``ttl`` segundos.
+
+        Regresa False si lo tiene otro ``holder`` y aún no vence.
+        """
+        raise NotImplementedError
+
+    def put_snapshot(self, digest: str, fetched_at: float, data: str | None) -> None:
+        """Guarda el snapshot compartido; con ``data`` None sólo actualiza ``fetched_at``."""
+        raise NotImplementedError
+
+    def get_snapshot(self, newer_than: float, known_digest: str = "") -> tuple[str, float, str | None] | None:
+        """(digest, fetched_at, data JSON) si hay uno traído después de ``newer_than``.
+
+        ``data`` es None si el digest es ``known_digest`` (no cambió el contenido).
+        """
+        raise NotImplementedError
+
+    def claim_once(self, key: str, ttl: float) -> bool:
+        """True sólo para el primero que reclama ``key`` en ``ttl`` segundos."""
+        raise NotImplementedError
+
+    def push_subscriptions(self) -> list[dict]:
+        raise NotImplementedError
+
+    def put_push_subscription(self, subscription: dict) -> None:
+        raise NotImplementedError
+
+    def delete_push_subscription(self, endpoint: str) -> bool:
+        """Regresa False si no existía."""
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """Estado en memoria del proceso. Sólo válido con un worker."""
+
+    def __init__(self, log_size: int = 1000):
+        self._orders: dict[int, Order] = {}
+        self._version = 0
+        self._changes: deque[dict] = deque(maxlen=log_size)
+        self._tokens = (settings.ACCESS_TOKEN, settings.REFRESH_TOKEN)
+        # key -> vence; en orden de inserción, que con ttl fijo es el de vencimiento
+        self._claims: dict[str, float] = {}
+        self._push_subscriptions: dict[str, dict] = {}
+        # Cada arranque empieza en versión 0 con otro instance_id
+        self.instance_id = secrets.token_hex(4)
+
+    def version(self) -> int:
+        return self._version
+
+    def load_orders(self) -> tuple[int, dict[int, Order]]:
+        return self._version, dict(self._orders)
+
+    def put_order(self, order: Order, change_type: str = "updated") -> int:
+        self._orders[order.order_id] = order
+        self._version += 1
+        self._changes.append(_change(self._version, change_type, order.order_id, order, time.time()))
+        return self._version
+
+    def delete_order(self, order_id: int) -> int:
+        self._orders.pop(order_id, None)
+        self._version += 1
+        self._changes.append(_change(self._version, "removed", order_id, None, time.time()))
+        return self._version
+
+    def changes_since(self, version: int) -> list[dict] | None:
+        if version >= self._version:
+            return []
+        # Las versiones en la bitácora son consecutivas, así que basta un índice
+        oldest = self._changes[0]["version"] if self._changes else self._version + 1
+        if version < oldest - 1:
+            return None
+        return list(islice(self._changes, version - oldest + 1, None))
+
+    def get_tokens(self) -> tuple[str, str]:
+        return self._tokens
+
+    def set_tokens(self, access_token: str, refresh_token: str) -> None:
+        self._tokens = (access_token, refresh_token)
+
+    # Un solo proceso: siempre es el líder y no hay con quién compartir
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        return True
+
+    def put_snapshot(self, digest: str, fetched_at: float, data: str | None) -> None:
+        pass
+
+    def get_snapshot(self, newer_than: float, known_digest: str = "") -> tuple[str, float, str | None] | None:
+        return None
+
+    def claim_once(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        while self._claims:
+            oldest, expires = next(iter(self._claims.items()))
+            if expires > now:
+                break
+            del self._claims[oldest]
+        if key in self._claims:
+            return False
+        self._claims[key] = now + ttl
+        return True
+
+    def push_subscriptions(self) -> list[dict]:
+        return list(self._push_subscriptions.values())
+
+    def put_push_subscription(self, subscription: dict) -> None:
+        self._push_subscriptions[subscription["endpoint"]] = subscription
+
+    def delete_push_subscription(self, endpoint: str) -> bool:
+        return self._push_subscriptions.pop(endpoint, None) is not None
+
+
+class SQLiteBackend(StateBackend):
+    """Estado en un archivo SQLite (modo WAL) compartido entre workers.
+
+    Una conexión por proceso protegida con un threading.Lock: los endpoints
+    síncronos de FastAPI corren en el threadpool y leen en paralelo.
+    """
+
+    def __init__(self, path: str, log_size: int = 1000):
+        self.path = path
+        self.log_size = log_size
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS orders (order_id INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "version INTEGER PRIMARY KEY, type TEXT NOT NULL, order_id INTEGER NOT NULL, "
+                "data TEXT, at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), digest TEXT NOT NULL, fetched_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, expires REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS push_subscriptions (endpoint TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', 0)")
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('instance_id', ?)", (secrets.token_hex(4),))
+            self.instance_id = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'instance_id'"
+            ).fetchone()[0]
+            # Los tokens del entorno sólo siembran la base: si otro worker ya
+            # los rotó, los de la base son los vigentes.
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('access_token', ?)", (settings.ACCESS_TOKEN,))
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('refresh_token', ?)", (settings.REFRESH_TOKEN,))
+
+    def _bump(self, change_type: str, order_id: int, data: str | None) -> int:
+        """Incrementa la versión y registra el evento. Llamar dentro de una transacción."""
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        version = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        self._conn.execute(
+            "INSERT INTO changes (version, type, order_id, data, at) VALUES (?, ?, ?, ?, ?)",
+            (version, change_type, order_id, data, time.time()),
+        )
+        self._conn.execute("DELETE FROM changes WHERE version <= ?", (version - self.log_size,))
+        return version
+
+    def version(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def load_orders(self) -> tuple[int, dict[int, Order]]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                version = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+                rows = self._conn.execute("SELECT data FROM orders").fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        orders = {}
+        for (data,) in rows:
+            order = Order.model_validate_json(data)
+            orders[order.order_id] = order
+        return version, orders
+
+    def put_order(self, order: Order, change_type: str = "updated") -> int:
+        data = order.model_dump_json()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO orders (order_id, data) VALUES (?, ?)",
+                    (order.order_id, data),
+                )
+                version = self._bump(change_type, order.order_id, data)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return version
+
+    def delete_order(self, order_id: int) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
+                version = self._bump("removed", order_id, None)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return version
+
+    def changes_since(self, version: int) -> list[dict] | None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                current = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+                if version >= current:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT version, type, order_id, data, at FROM changes WHERE version > ? ORDER BY version",
+                    (version,),
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        if not rows or rows[0][0] != version + 1:
+            return None
+        return [
+            _change(v, change_type, order_id, Order.model_validate_json(data) if data else None, at)
+            for v, change_type, order_id, data, at in rows
+        ]
+
+    def get_tokens(self) -> tuple[str, str]:
+        with self._lock:
+            rows = dict(self._conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('access_token', 'refresh_token')"
+            ).fetchall())
+        return rows.get("access_token", ""), rows.get("refresh_token", "")
+
+    def set_tokens(self, access_token: str, refresh_token: str) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("access_token", access_token), ("refresh_token", refresh_token)],
+            )
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT holder, expires FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] != holder and row[1] > now:
+                    acquired = False
+                else:
+                    self._conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (name, holder, now + ttl))
+                    acquired = True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return acquired
+
+    def put_snapshot(self, digest: str, fetched_at: float, data: str | None) -> None:
+        with self._lock:
+            if data is None:
+                self._conn.execute(
+                    "UPDATE snapshot SET fetched_at = ? WHERE id = 1 AND digest = ?", (fetched_at, digest)
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshot VALUES (1, ?, ?, ?)", (digest, fetched_at, data)
+                )
+
+    def get_snapshot(self, newer_than: float, known_digest: str = "") -> tuple[str, float, str | None] | None:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT digest, fetched_at, CASE WHEN digest = ? THEN NULL ELSE data END "
+                "FROM snapshot WHERE id = 1 AND fetched_at > ?",
+                (known_digest, newer_than),
+            ).fetchone()
+
+    def claim_once(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM claims WHERE expires <= ?", (now,))
+                claimed = self._conn.execute(
+                    "INSERT OR IGNORE INTO claims VALUES (?, ?)", (key, now + ttl)
+                ).rowcount == 1
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return claimed
+
+    def push_subscriptions(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM push_subscriptions").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put_push_subscription(self, subscription: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO push_subscriptions VALUES (?, ?)",
+                (subscription["endpoint"], json.dumps(subscription)),
+            )
+
+    def delete_push_subscription(self, endpoint: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM push_subscriptions WHERE endpoint = ?", (endpoint,)
+            ).rowcount == 1
+
+
+def create_backend() -> StateBackend:
+    if settings.STATE_BACKEND == "sqlite":
+        return SQLiteBackend(settings.STATE_DB_PATH, log_size=settings.CHANGE_LOG_SIZE)
+    if settings.STATE_BACKEND != "memory":
+        raise ValueError(f"STATE_BACKEND desconocido: {settings.STATE_BACKEND!r}")
+    return MemoryBackend(log_size=settings.CHANGE_LOG_SIZE)
+
+
+# Instancia global
+state_backend = create_backend()
@@ -0,0 +1,261 @@
+"""Proxy de miniaturas de productos con cache en disco.
+
+Las tarjetas y el modal apuntan a ``/thumbs/{item_id}/{variation_id}`` en vez
+de a la foto de ML. La primera petición baja la imagen, la reduce al tamaño
+pedido (si está instalado Pillow) y la guarda en disco; las siguientes se
+sirven de ahí. El cache tiene un tope en bytes y borra primero lo que lleva
+más tiempo sin usarse.
+
+Lo que bloquea (leer y escribir archivos, decodificar y reducir con
+Pillow, borrar al desalojar) corre en un hilo con ``asyncio.to_thread``;
+el event loop sólo mueve el índice en memoria.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+import httpx
+from fastapi import APIRouter, Request
+from fastapi.responses import RedirectResponse, Response
+from app.config import settings
+from app.meli_client import meli
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él se guarda la imagen original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Tarjetas (60px) y foto del modal (160px), al doble para pantallas retina
+THUMB_SIZES = (120, 320)
+DEFAULT_SIZE = 120
+
+# La foto de un listado casi nunca cambia, pero la URL no lleva hash: una
+# semana de cache y revalidación en segundo plano.
+THUMB_CACHE_CONTROL = "public, max-age=604800, stale-while-revalidate=86400"
+
+_ITEM_ID = re.compile(r"^[A-Z]{3}\d+$")
+
+
+def _media_type(data: bytes) -> str:
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:4] == b"GIF8":
+        return "image/gif"
+    return "application/octet-stream"
+
+
+def _downscale(data: bytes, size: int) -> bytes:
+    """Reduce la imagen para que su lado mayor mida ``size`` px (JPEG)."""
+    if Image is None:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) <= size:
+                return data
+            img.thumbnail((size, size))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=82, optimize=True)
+            return out.getvalue()
+    except Exception as exc:
+        logger.warning("No se pudo reducir la miniatura: %s", exc)
+        return data
+
+
+class ThumbCache:
+    """Miniaturas en disco con tope de tamaño (LRU por fecha de uso).
+
+    Un archivo por (item_id, variation_id, tamaño). El índice en memoria se
+    arma al primer uso leyendo el directorio, así que sobrevive reinicios.
+    Varias peticiones de la misma miniatura que no está en disco comparten
+    una sola descarga.
+
+    Las URLs originales (``remember_source``) se guardan en un LRU de
+    ``MAX_SOURCES`` entradas: si una sale, se vuelve a preguntar a ML.
+    """
+
+    MAX_SOURCES = 10000
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # thumb_url se llama también desde endpoints síncronos (threadpool)
+        self._sources: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._sources_lock = threading.Lock()
+        self._files: OrderedDict[str, int] | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def remember_source(self, item_id: str, variation_id: str, url: str) -> None:
+        """URL original en ML, para no tener que preguntarla al descargar."""
+        key = (item_id, variation_id)
+        with self._sources_lock:
+            self._sources[key] = url
+            self._sources.move_to_end(key)
+            while len(self._sources) > self.MAX_SOURCES:
+                self._sources.popitem(last=False)
+
+    def source(self, item_id: str, variation_id: str) -> str | None:
+        with self._sources_lock:
+            return self._sources.get((item_id, variation_id))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _scan(self) -> OrderedDict[str, int]:
+        """Archivos del directorio, del uso más viejo al más reciente."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(self._path(name))
+            except OSError:
+                continue
+            found.append((st.st_mtime, name, st.st_size))
+        found.sort()
+        return OrderedDict((name, size) for _, name, size in found)
+
+    async def _index(self) -> OrderedDict[str, int]:
+        if self._files is None:
+            files = await asyncio.to_thread(self._scan)
+            if self._files is None:  # otra petición pudo terminar primero
+                self._files = files
+                self.total_bytes = sum(files.values())
+        return self._files
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _remove(paths: list[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def get(self, item_id: str, variation_id: str, size: int) -> bytes:
+        name = f"{item_id}_{variation_id}_{size}"
+        files = await self._index()
+        if name in files:
+            try:
+                data = await asyncio.to_thread(self._read, self._path(name))
+                if name in files:
+                    files.move_to_end(name)
+                self.hits += 1
+                return data
+            except OSError:
+                # Lo borró otro worker al desalojar: se vuelve a bajar
+                self.total_bytes -= files.pop(name, 0)
+
+        self.misses += 1
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.create_task(self._download(name, item_id, variation_id, size))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, name: str, item_id: str, variation_id: str, size: int) -> bytes:
+        url = self.source(item_id, variation_id)
+        if not url:
+            vid = None if variation_id == "0" else variation_id
+            thumbnails = await meli.get_items_thumbnails([(item_id, vid)])
+            url = thumbnails.get((item_id, vid), "")
+            if not url:
+                raise LookupError(f"Sin foto para {item_id}/{variation_id}")
+            self.remember_source(item_id, variation_id, url)
+
+        async with httpx.AsyncClient(follow_redirects=True, timeout=10) as client:
+            r = await client.get(url)
+            r.raise_for_status()
+        data = await asyncio.to_thread(_downscale, r.content, size)
+        await self._store(name, data)
+        return data
+
+    async def _store(self, name: str, data: bytes) -> None:
+        files = await self._index()
+        await asyncio.to_thread(self._write, self._path(name), data)
+        self.total_bytes += len(data) - files.pop(name, 0)
+        files[name] = len(data)
+
+        victims = []
+        while self.total_bytes > self.max_bytes and len(files) > 1:
+            victim, victim_size = files.popitem(last=False)
+            victims.append(self._path(victim))
+            self.total_bytes -= victim_size
+            self.evictions += 1
+        if victims:
+            await asyncio.to_thread(self._remove, victims)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._files or ()),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Instancia global
+thumb_cache = ThumbCache(settings.THUMBS_DIR, settings.THUMBS_MAX_BYTES)
+
+
+def thumb_url(item_id: str, variation_id: str | None, source: str) -> str:
+    """URL local de la miniatura de un producto (o ``source`` si no aplica)."""
+    if not source or not _ITEM_ID.match(item_id or ""):
+        return source or ""
+    vid = str(variation_id or 0)
+    thumb_cache.remember_source(item_id, vid, source)
+    return f"/thumbs/{item_id}/{vid}"
+
+
+@router.get("/{item_id}/{variation_id}")
+async def thumbnail(item_id: str, variation_id: str, request: Request, size: int = DEFAULT_SIZE):
+    if not _ITEM_ID.match(item_id) or not variation_id.isdigit() or size not in THUMB_SIZES:
+        return Response(status_code=404)
+    try:
+        data = await thumb_cache.get(item_id, variation_id, size)
+    except Exception as exc:
+        logger.warning("Miniatura %s/%s no disponible: %s", item_id, variation_id, exc)
+        # Mejor la foto original que un hueco en la tarjeta
+        source = thumb_cache.source(item_id, variation_id)
+        if source:
+            return RedirectResponse(source, status_code=302)
+        return Response(status_code=404)
+
+    etag = f'"{hashlib.blake2b(data, digest_size=8).hexdigest()}"'
+    headers = {"Cache-Control": THUMB_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=_media_type(data), headers=headers)
@@ -1,5 +1,7 @@
 """Componentes de UI compartidos — layout base, nav, estilos, modal."""
 
+from app.assets import register_asset
+
 
 # ── Design tokens & global CSS ──────────────────────────────────────────────
 
@@ -518,6 +520,21 @@ tbody tr:hover td { background: var(--surface-hover); cursor: pointer; }
 .error-banner p { color: #b91c1c; font-size: 13px; margin-top: 3px; }
 
 /* ── PEDIDO CARDS (ventas page) ── */
+[hidden] { display: none !important; }
+
+.section-more {
+    padding: 16px;
+    text-align: center;
+    font-size: 13px;
+    color: var(--text-muted);
+}
+
+.pedido-card.live-flash { animation: live-flash 2.5s ease-out; }
+@keyframes live-flash {
+    from { box-shadow: 0 0 0 3px var(--accent); }
+    to   { box-shadow: none; }
+}
+
 .section {
     background: var(--surface);
     border: 1px solid var(--border);
@@ -1103,18 +1120,64 @@ tbody tr:hover td { background: var(--surface-hover); cursor: pointer; }
 # ── JavaScript for modal ─────────────────────────────────────────────────────
 
 MODAL_JS = """
-<script>
 (function() {
     const backdrop = document.getElementById('order-modal-backdrop');
     const modalBody = document.getElementById('modal-body');
 
+    // Detalle ya conocido por envío: JSON embebido en la página, precargas al
+    // pasar el mouse y eventos en vivo. Si está aquí, el modal abre sin esperar.
+    const details = {};
+    const blob = document.getElementById('shipment-details');
+    if (blob) {
+        try { Object.assign(details, JSON.parse(blob.textContent)); } catch (e) {}
+    }
+
     function openModal(shipmentId) {
         backdrop.classList.add('open');
         document.body.style.overflow = 'hidden';
+        const known = details[shipmentId];
+        if (known) {
+            modalBody.innerHTML = buildModal(known);
+            return;
+        }
         renderLoading();
         fetchShipment(shipmentId);
     }
 
+    // Precarga en lote de las tarjetas que el usuario está por abrir
+    const requested = new Set();
+    let prefetchQueue = [];
+    let prefetchTimer = null;
+
+    function prefetch(shipmentId) {
+        if (!shipmentId || details[shipmentId] || requested.has(shipmentId)) return;
+        requested.add(shipmentId);
+        prefetchQueue.push(shipmentId);
+        if (!prefetchTimer) prefetchTimer = setTimeout(flushPrefetch, 80);
+    }
+
+    function flushPrefetch() {
+        const ids = prefetchQueue;
+        prefetchQueue = [];
+        prefetchTimer = null;
+        fetch('/ventas/api/envios?ids=' + ids.join(','))
+            .then(function(r) { return r.ok ? r.json() : {}; })
+            .then(function(data) {
+                Object.assign(details, data.shipments || {});
+                // Los que el servidor no alcanzó a traer se pueden volver a pedir
+                (data.skipped || []).forEach(function(id) { requested.delete(id); });
+            })
+            .catch(function() {});
+    }
+
+    function onIntent(e) {
+        const card = e.target.closest && e.target.closest('[data-shipment-id]');
+        if (card) prefetch(card.dataset.shipmentId);
+    }
+    document.addEventListener('mouseover', onIntent);
+    document.addEventListener('focusin', onIntent);
+    document.addEventListener('touchstart', onIntent, {passive: true});
+
     function closeModal() {
         backdrop.classList.remove('open');
         document.body.style.overflow = '';
@@ -1129,6 +1192,12 @@ MODAL_JS = """
             </div>`;
     }
 
+    // Miniatura local reducida (/thumbs) si la hay; si no, la foto de ML
+    function thumbSrc(item, size) {
+        if (!item.thumb_url) return item.thumbnail;
+        return size ? item.thumb_url + '?size=' + size : item.thumb_url;
+    }
+
     function fmtDate(str) {
         if (!str) return '—';
         try {
@@ -1170,7 +1239,7 @@ MODAL_JS = """
 
     function buildModal(o) {
         const photo = (o.items && o.items.length > 0 && o.items[0].thumbnail)
-            ? `<img src="${o.items[0].thumbnail}" class="modal-photo" alt="Foto del producto">`
+            ? `<img src="${thumbSrc(o.items[0], 320)}" class="modal-photo" alt="Foto del producto" decoding="async">`
             : `<div class="modal-photo-placeholder"></div>`;
 
         const mainTitle = (o.items && o.items.length > 0)
@@ -1183,7 +1252,7 @@ MODAL_JS = """
 
         const itemsHtml = (o.items || []).map(item => {
             const thumb = item.thumbnail
-                ? `<img src="${item.thumbnail}" class="modal-item-thumb" alt="">`
+                ? `<img src="${thumbSrc(item)}" class="modal-item-thumb" alt="" width="56" height="56" loading="lazy" decoding="async">`
                 : `<div class="modal-item-thumb-empty"></div>`;
             const albumHtml = item.album
                 ? `<div class="modal-item-album">${item.album}</div>`
@@ -1276,6 +1345,7 @@ MODAL_JS = """
             if (!resp.ok) throw new Error('HTTP ' + resp.status);
             const data = await resp.json();
             if (data.error) throw new Error(data.error);
+            details[shipmentId] = data;
             modalBody.innerHTML = buildModal(data);
         } catch(err) {
             modalBody.innerHTML = `
@@ -1307,8 +1377,266 @@ MODAL_JS = """
     // Expose globally
     window.openShipmentModal = openModal;
     window.closeOrderModal = closeModal;
+    window.shipmentDetails = details;
+})();
+"""
+
+# ── JavaScript for /ventas/ (paging + live updates) ─────────────────────────
+# Carga más tarjetas por sección al hacer scroll (/ventas/api/cards) y
+# vacía las páginas que quedan lejos de la pantalla para que el DOM no crezca
+# sin límite. Escucha /ventas/events y parcha las tarjetas por
+# data-shipment-id sin recargar. "Actualizar" sólo pide el refresco compartido.
+
+VENTAS_JS = """
+(function() {
+    const marker = document.getElementById('ventas-live');
+    if (!marker) return;
+
+    function cardSelector(id) {
+        return '.pedido-card[data-shipment-id="' + CSS.escape(String(id)) + '"]';
+    }
+
+    function findCard(id) {
+        return document.querySelector(cardSelector(id));
+    }
+
+    function isDuplicate(card) {
+        return document.querySelectorAll(cardSelector(card.dataset.shipmentId)).length > 1;
+    }
+
+    // Tarjetas quitadas o movidas mientras su página estaba vaciada: al
+    // restaurar esa página no deben volver a aparecer
+    const gone = new Set();
+
+    // ── Paginación ──
+    const pageObserver = 'IntersectionObserver' in window
+        ? new IntersectionObserver(onPageVisibility, {rootMargin: '1500px 0px'})
+        : null;
+    const moreObserver = 'IntersectionObserver' in window
+        ? new IntersectionObserver(onMoreVisible, {rootMargin: '600px 0px'})
+        : null;
+    const parked = new WeakMap();
+
+    function onPageVisibility(entries) {
+        entries.forEach(function(entry) {
+            const page = entry.target;
+            if (!entry.isIntersecting && !parked.has(page) && page.childElementCount) {
+                // Lejos de la pantalla: guardar el HTML y dejar sólo el alto
+                page.style.height = page.offsetHeight + 'px';
+                parked.set(page, page.innerHTML);
+                page.innerHTML = '';
+            } else if (entry.isIntersecting && parked.has(page)) {
+                page.innerHTML = parked.get(page);
+                parked.delete(page);
+                page.style.height = '';
+                page.querySelectorAll('.pedido-card').forEach(function(card) {
+                    if (gone.has(card.dataset.shipmentId) || isDuplicate(card)) card.remove();
+                });
+            }
+        });
+    }
+
+    function onMoreVisible(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) loadMore(entry.target);
+        });
+    }
+
+    function loadMore(sentinel) {
+        if (sentinel.dataset.loading) return;
+        sentinel.dataset.loading = '1';
+        fetch('/ventas/api/cards?category=' + encodeURIComponent(sentinel.dataset.section) +
+              '&cursor=' + encodeURIComponent(sentinel.dataset.next))
+            .then(function(r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+            .then(function(data) {
+                const page = document.createElement('div');
+                page.className = 'card-page';
+                page.innerHTML = data.html;
+                page.querySelectorAll('.pedido-card').forEach(function(card) {
+                    if (findCard(card.dataset.shipmentId)) card.remove();
+                    else gone.delete(card.dataset.shipmentId);
+                });
+                sentinel.parentNode.insertBefore(page, sentinel);
+                if (pageObserver) pageObserver.observe(page);
+                if (window.shipmentDetails) Object.assign(window.shipmentDetails, data.details);
+                delete sentinel.dataset.loading;
+                if (data.next_cursor) {
+                    sentinel.dataset.next = data.next_cursor;
+                    // Si sigue a la vista (página corta), volver a disparar
+                    moreObserver.unobserve(sentinel);
+                    moreObserver.observe(sentinel);
+                } else {
+                    moreObserver.unobserve(sentinel);
+                    sentinel.remove();
+                }
+            })
+            .catch(function() {
+                delete sentinel.dataset.loading;
+                sentinel.textContent = 'No se pudieron cargar más pedidos';
+            });
+    }
+
+    if (pageObserver) {
+        document.querySelectorAll('.card-page').forEach(function(page) { pageObserver.observe(page); });
+        document.querySelectorAll('.section-more').forEach(function(s) { moreObserver.observe(s); });
+    } else {
+        document.querySelectorAll('.section-more').forEach(function(s) { s.remove(); });
+    }
+
+    // ── Actualizaciones en vivo ──
+    if (!window.EventSource) return;
+
+    function upsert(ev) {
+        if (window.shipmentDetails && ev.detail) window.shipmentDetails[ev.shipment_id] = ev.detail;
+        const old = findCard(ev.shipment_id);
+        if (old) old.remove();
+        const section = document.getElementById('section-' + ev.category);
+        if (!section) return;
+        const tpl = document.createElement('template');
+        tpl.innerHTML = ev.html.trim();
+        const card = tpl.content.firstElementChild;
+        const before = ev.before ? findCard(ev.before) : null;
+        if (before) {
+            before.parentNode.insertBefore(card, before);
+        } else if (section.querySelector('.section-more')) {
+            // Va en una página que aún no se carga: llegará con ella
+            gone.add(String(ev.shipment_id));
+            return;
+        } else {
+            const pages = section.querySelectorAll('.card-page');
+            (pages.length ? pages[pages.length - 1] : section).appendChild(card);
+        }
+        gone.delete(String(ev.shipment_id));
+        if (ev.type !== 'status') card.classList.add('live-flash');
+    }
+
+    function remove(ev) {
+        if (window.shipmentDetails) delete window.shipmentDetails[ev.shipment_id];
+        gone.add(String(ev.shipment_id));
+        const card = findCard(ev.shipment_id);
+        if (card) card.remove();
+    }
+
+    function setStats(ev) {
+        Object.keys(ev.values).forEach(function(key) {
+            const el = document.getElementById('stat-' + key);
+            if (el) el.textContent = ev.values[key];
+        });
+        // Los totales vienen del servidor: la página sólo tiene una ventana de tarjetas
+        let total = 0;
+        Object.keys(ev.sections || {}).forEach(function(category) {
+            const n = ev.sections[category];
+            total += n;
+            const section = document.getElementById('section-' + category);
+            if (!section) return;
+            section.hidden = n === 0;
+            const count = section.querySelector('.section-count');
+            if (count) count.textContent = '(' + n + ')';
+        });
+        const empty = document.getElementById('ventas-empty');
+        if (empty && ev.sections) empty.hidden = total > 0;
+    }
+
+    // El estado de la página no está en la historia del worker: pedir la
+    // vista completa y reemplazar secciones, stats y detalles en su lugar
+    // (sin recargar ni cerrar la conexión en vivo)
+    let resyncing = false;
+    function resync() {
+        if (resyncing) return;
+        resyncing = true;
+        fetch('/ventas/?stream=0', {cache: 'no-store'})
+            .then(function(r) { if (!r.ok) throw new Error(r.status); return r.text(); })
+            .then(function(html) {
+                const doc = new DOMParser().parseFromString(html, 'text/html');
+                document.querySelectorAll('.section[id^="section-"], [id^="stat-"], #ventas-empty').forEach(function(el) {
+                    const fresh = doc.getElementById(el.id);
+                    if (fresh) el.replaceWith(document.adoptNode(fresh));
+                });
+                const blob = doc.getElementById('shipment-details');
+                if (blob && window.shipmentDetails) Object.assign(window.shipmentDetails, JSON.parse(blob.textContent));
+                gone.clear();
+                if (pageObserver) {
+                    document.querySelectorAll('.card-page').forEach(function(page) { pageObserver.observe(page); });
+                    document.querySelectorAll('.section-more').forEach(function(s) { moreObserver.observe(s); });
+                } else {
+                    document.querySelectorAll('.section-more').forEach(function(s) { s.remove(); });
+                }
+            })
+            .catch(function() {})
+            .then(function() { resyncing = false; });
+    }
+
+    const source = new EventSource('/ventas/events?last_id=' + encodeURIComponent(marker.dataset.liveSeq || ''));
+    function on(type, fn) {
+        source.addEventListener(type, function(e) { fn(JSON.parse(e.data)); });
+    }
+    on('new', upsert);
+    on('status', upsert);
+    on('delayed', upsert);
+    on('removed', remove);
+    on('stats', setStats);
+    on('reset', resync);
+
+    // "Actualizar": con la conexión en vivo basta pedir el refresco compartido
+    const button = document.getElementById('ventas-refresh');
+    if (button) {
+        button.onclick = function(e) {
+            if (source.readyState !== EventSource.OPEN) return;
+            e.preventDefault();
+            button.textContent = 'Actualizando…';
+            button.style.pointerEvents = 'none';
+            fetch('/ventas/refresh', {method: 'POST'})
+                .then(function(r) { if (!r.ok) throw new Error(r.status); })
+                .then(function() {
+                    button.textContent = 'Actualizar';
+                    button.style.pointerEvents = '';
+                })
+                .catch(function() { location.href = button.href; });
+        };
+    }
+})();
+"""
+
+# ── JavaScript for the dashboard stat cards ─────────────────────────────────
+# Consulta /api/counters con la pestaña visible; si nada cambió el servidor
+# responde 304 y no se toca el DOM.
+
+DASHBOARD_JS = """
+(function() {
+    const POLL_MS = 30000;
+    let timer = null;
+
+    function set(id, text) {
+        const el = document.getElementById(id);
+        if (el && el.textContent !== text) el.textContent = text;
+    }
+
+    function poll() {
+        fetch('/api/counters', {cache: 'no-cache'})
+            .then(function(r) { return r.ok ? r.json() : null; })
+            .then(function(c) {
+                if (!c || c.error) return;
+                set('stat-delayed', String(c.delayed));
+                set('stat-ready', String(c.ready));
+                set('stat-shipped', String(c.shipped));
+                set('stat-amount', '$' + Math.round(c.total_amount).toLocaleString('en-US'));
+                set('stat-amount-detail', 'MXN · ' + c.orders + ' pedido' + (c.orders !== 1 ? 's' : ''));
+            })
+            .catch(function() {});
+    }
+
+    function schedule() {
+        clearInterval(timer);
+        timer = null;
+        if (document.visibilityState === 'visible') timer = setInterval(poll, POLL_MS);
+    }
+
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'visible') poll();
+        schedule();
+    });
+    schedule();
 })();
-</script>
 """
 
 MODAL_HTML = """
@@ -1318,19 +1646,26 @@ MODAL_HTML = """
 """
 
 
-def base_layout(title: str, content: str, active: str = "") -> str:
-    """Genera el HTML completo con layout, nav, estilos y modal de detalle."""
-    nav_items = [
-        ("Dashboard", "/", "dashboard"),
-        ("Ventas", "/ventas/", "ventas"),
-        ("Notificaciones", "/notificaciones/", "notificaciones"),
-    ]
+# ── Static assets ────────────────────────────────────────────────────────────
+# CSS y JS se sirven desde /static con hash en la URL en vez de incrustarse
+# en cada página.
 
-    nav_links = ""
-    for label, href, key in nav_items:
-        active_class = ' class="active"' if key == active else ""
-        nav_links += f'<a href="{href}"{active_class}>{label}</a>'
+CSS_ASSET = register_asset("app", "css", GLOBAL_CSS, "text/css; charset=utf-8")
+JS_ASSET = register_asset("app", "js", MODAL_JS, "application/javascript; charset=utf-8")
+VENTAS_JS_ASSET = register_asset("ventas", "js", VENTAS_JS, "application/javascript; charset=utf-8")
+DASHBOARD_JS_ASSET = register_asset("dashboard", "js", DASHBOARD_JS, "application/javascript; charset=utf-8")
+
+# Entra en los ETag de las páginas: si cambian los assets, cambia la página
+ASSETS_VERSION = CSS_ASSET.digest[:6] + JS_ASSET.digest[:6] + VENTAS_JS_ASSET.digest[:6] + DASHBOARD_JS_ASSET.digest[:6]
 
+
+def layout_head(title: str, active: str = "") -> str:
+    """Parte del layout hasta la apertura de <main>: head, estilos y navbar.
+
+    Junto con ``layout_tail`` permite mandar el esqueleto de la página antes
+    de tener el contenido (respuestas en streaming).
+    """
+    nav_links = _nav_links(active)
     return f"""<!DOCTYPE html>
 <html lang="es">
 <head>
@@ -1338,7 +1673,7 @@ def base_layout(title: str, content: str, active: str = "") -> str:
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title} — ML Gestión</title>
     <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><rect width='100' height='100' rx='18' fill='%231a2332'/><rect x='22' y='22' width='56' height='56' rx='10' fill='%23ffe600'/></svg>">
-    <style>{GLOBAL_CSS}</style>
+    <link rel="stylesheet" href="{CSS_ASSET.url}">
 </head>
 <body>
     <nav class="navbar">
@@ -1359,7 +1694,13 @@ def base_layout(title: str, content: str, active: str = "") -> str:
     </nav>
 
     <main class="container">
-        {content}
+"""
+
+
+def layout_tail(active: str = "") -> str:
+    """Cierre del layout: nav móvil, modal de detalle y script."""
+    nav_links = _nav_links(active)
+    return f"""
     </main>
 
     <div class="mobile-nav">
@@ -1369,6 +1710,25 @@ def base_layout(title: str, content: str, active: str = "") -> str:
     </div>
 
     {MODAL_HTML}
-    {MODAL_JS}
+    <script src="{JS_ASSET.url}"></script>
 </body>
 </html>"""
+
+
+def _nav_links(active: str) -> str:
+    nav_items = [
+        ("Dashboard", "/", "dashboard"),
+        ("Ventas", "/ventas/", "ventas"),
+        ("Notificaciones", "/notificaciones/", "notificaciones"),
+    ]
+
+    nav_links = ""
+    for label, href, key in nav_items:
+        active_class = ' class="active"' if key == active else ""
+        nav_links += f'<a href="{href}"{active_class}>{label}</a>'
+    return nav_links
+
+
+def base_layout(title: str, content: str, active: str = "") -> str:
+    """Genera el HTML completo con layout, nav, estilos y modal de detalle."""
+    return layout_head(title, active) + content + layout_tail(active)
@@ -1,36 +1,37 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response
 from app.routes import orders, webhooks, notifications, ventas
 from app.routes.dashboard import router as dashboard_router
 from app.routes.notificaciones_page import router as notificaciones_page_router
 from app.auth import router as auth_router
-from app.scheduler import lifespan
-from app.config import settings
+from app.assets import router as assets_router
+from app.thumbs import router as thumbs_router
+from app.push import SERVICE_WORKER_JS
+from app.scheduler import lifespan, scheduler
+from app.ip_allowlist import ip_access
+from app.compression import CompressionMiddleware
 
 app = FastAPI(title="Mercado Libre - Gestión de Ventas", lifespan=lifespan)
 
+# Se registra antes que ip_whitelist para quedar por dentro de ella: así ve
+# las respuestas originales de cada ruta y no el cuerpo re-transmitido.
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 
 OPEN_PATHS = {"/", "/health", "/auth/login", "/auth/callback", "/webhooks/receive", "/webhooks/forward"}
+# CSS/JS del layout: "/" es abierta y sin ellos se vería sin estilos
+OPEN_PREFIXES = ("/static/",)
 
 
 @app.middleware("http")
 async def ip_whitelist(request: Request, call_next):
     # Dejar pasar rutas que necesitan acceso abierto (healthcheck, webhooks, auth)
-    if request.url.path in OPEN_PATHS:
-        return await call_next(request)
-
-    if not settings.ALLOWED_IPS:
+    if request.url.path in OPEN_PATHS or request.url.path.startswith(OPEN_PREFIXES):
         return await call_next(request)
 
-    allowed = {ip.strip() for ip in settings.ALLOWED_IPS.split(",") if ip.strip()}
-    client_ip = request.client.host
-
-    # Revisar también X-Forwarded-For (Railway usa proxy)
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        client_ip = forwarded.split(",")[0].strip()
-
-    if client_ip not in allowed:
+    # X-Forwarded-For cuenta según TRUSTED_PROXIES (Railway usa proxy)
+    peer = request.client.host if request.client else None
+    if not ip_access.is_allowed(peer, request.headers.get("x-forwarded-for")):
         return JSONResponse(status_code=403, content={"detail": "IP no autorizada"})
 
     return await call_next(request)
@@ -42,6 +43,14 @@ app.include_router(webhooks.router, prefix="/webhooks", tags=["Webhooks"])
 app.include_router(notifications.router, prefix="/notifications", tags=["Notificaciones"])
 app.include_router(ventas.router, prefix="/ventas", tags=["Ventas"])
 app.include_router(notificaciones_page_router, prefix="/notificaciones", tags=["Notificaciones Page"])
+app.include_router(assets_router, prefix="/static", tags=["Static"])
+app.include_router(thumbs_router, prefix="/thumbs", tags=["Miniaturas"])
+
+
+@app.get("/sw.js", include_in_schema=False)
+def service_worker():
+    """Service worker de Web Push (en la raíz para que su scope cubra todo el sitio)."""
+    return Response(SERVICE_WORKER_JS, media_type="application/javascript", headers={"Cache-Control": "no-cache"})
 
 
 @app.get("/health")
@@ -51,4 +60,5 @@ def health():
         "status": "healthy",
         "pending_orders": order_manager.get_pending_count(),
         "urgent_orders": len(order_manager.get_urgent_orders()),
+        "jobs": scheduler.status(),
     }
@@ -0,0 +1,98 @@
+"""Benchmark del render de tarjetas de /ventas/ con y sin cache de fragmentos.
+
+Genera N pedidos enriquecidos sintéticos y mide cuánto tarda armar la
+sección completa: primero en frío (todas las tarjetas se renderizan) y
+luego en caliente (todas salen del cache). Se renderizan todas las tarjetas,
+no sólo la primera ventana de la sección.
+
+Uso:
+    python scripts/bench_cards.py [--sizes 1000 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.fragment_cache import fragment_cache  # noqa: E402
+from app.routes.ventas import _build_order_card_html, _render_order_card  # noqa: E402
+
+
+def synthetic_orders(n: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    orders = []
+    for i in range(n):
+        deadline = (now + timedelta(hours=(i % 96) - 24, minutes=30)).isoformat()
+        orders.append({
+            "order_id": 2000000000 + i,
+            "shipment_id": 4000000000 + i,
+            "version": hash(("bench", i)),
+            "deadline_ts": int((now + timedelta(hours=(i % 96) - 24, minutes=30)).timestamp()),
+            "buyer": f"COMPRADOR{i}",
+            "total": 299.0 + i % 500,
+            "currency": "MXN",
+            "date_created": (now - timedelta(hours=i % 48)).isoformat(),
+            "deadline_str": deadline,
+            "delivery_str": (now + timedelta(days=3)).isoformat(),
+            "status_label": "Imprimir etiqueta",
+            "status_cls": "badge-accent",
+            "category": "ready",
+            "tiempo_text": "5h restantes",
+            "tiempo_cls": "badge-warning",
+            "shipping_substatus_raw": "ready_to_print",
+            "items": [{
+                "title": f"Álbum {i % 40} — Edición especial",
+                "album": f"Versión {'ABC'[i % 3]}",
+                "qty": 1 + i % 2,
+                "sku": f"SKU-{i % 40:04d}",
+                "unit_price": 299.0,
+                "thumbnail": f"https://http2.mlstatic.com/D_{i % 40}-I.jpg",
+                "item_id": f"MLM{100000 + i % 40}",
+            }],
+        })
+    return orders
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        orders = synthetic_orders(n)
+        fragment_cache.maxsize = max(fragment_cache.maxsize, n)
+
+        no_cache = timed(lambda: "".join(_build_order_card_html(o) for o in orders), args.repeat)
+
+        def render_all():
+            return "".join(_render_order_card(o) for o in orders)
+
+        def cold():
+            fragment_cache.clear()
+            render_all()
+
+        cold_t = timed(cold, args.repeat)
+        render_all()
+        warm_t = timed(render_all, args.repeat)
+
+        print(
+            f"{n:>6} tarjetas  sin cache {no_cache * 1000:8.1f} ms  "
+            f"cache frío {cold_t * 1000:8.1f} ms  cache caliente {warm_t * 1000:8.1f} ms  "
+            f"({no_cache / warm_t:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark de ordenar y clasificar pedidos: fechas ISO vs epoch pre-parseado.
+
+Compara, sobre N pedidos enriquecidos sintéticos:
+- ordenar con la llave anterior (parsea ``deadline_str`` / ``date_created``
+  en cada llave) contra ``_sort_key`` (enteros ya parseados al enriquecer);
+- el chequeo de demorado / bucket de tiempo parseando el deadline contra
+  comparar el epoch guardado.
+
+Uso:
+    python scripts/bench_sort.py [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.routes.ventas import CATEGORY_ORDER, _parse_date, _sort_key, _time_bucket, _to_ts  # noqa: E402
+
+
+def synthetic_orders(n: int) -> list[dict]:
+    rng = random.Random(n)
+    now = datetime.now(timezone.utc)
+    orders = []
+    for i in range(n):
+        created = (now - timedelta(minutes=rng.randrange(0, 7 * 24 * 60))).isoformat().replace("+00:00", "Z")
+        deadline = None
+        if i % 10:
+            deadline = (now + timedelta(minutes=rng.randrange(-48 * 60, 96 * 60))).isoformat().replace("+00:00", "Z")
+        orders.append({
+            "order_id": 2000000000 + i,
+            "category": rng.choice(list(CATEGORY_ORDER)),
+            "date_created": created,
+            "deadline_str": deadline,
+            "created_ts": _to_ts(created),
+            "deadline_ts": _to_ts(deadline),
+        })
+    return orders
+
+
+def iso_sort_key(order: dict) -> tuple:
+    """La llave de antes: parsea las fechas en cada llamada."""
+    cat = CATEGORY_ORDER.get(order["category"], 99)
+    deadline_dt = _parse_date(order["deadline_str"])
+    if not deadline_dt:
+        deadline_dt = _parse_date(order["date_created"]) or datetime.max.replace(tzinfo=timezone.utc)
+    return (cat, deadline_dt)
+
+
+def iso_time_bucket(deadline_str: str | None) -> int | None:
+    dt = _parse_date(deadline_str)
+    if not dt:
+        return None
+    return math.floor((dt - datetime.now(timezone.utc)).total_seconds() / 3600)
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        orders = synthetic_orders(n)
+        assert [o["order_id"] for o in sorted(orders, key=iso_sort_key)] == \
+            [o["order_id"] for o in sorted(orders, key=_sort_key)]
+
+        sort_iso = timed(lambda: sorted(orders, key=iso_sort_key), args.repeat)
+        sort_ts = timed(lambda: sorted(orders, key=_sort_key), args.repeat)
+        bucket_iso = timed(lambda: [iso_time_bucket(o["deadline_str"]) for o in orders], args.repeat)
+        bucket_ts = timed(lambda: [_time_bucket(o["deadline_ts"]) for o in orders], args.repeat)
+
+        print(
+            f"{n:>7} pedidos  ordenar ISO {sort_iso * 1000:8.1f} ms  epoch {sort_ts * 1000:8.1f} ms "
+            f"({sort_iso / sort_ts:.1f}x)  bucket ISO {bucket_iso * 1000:8.1f} ms  "
+            f"epoch {bucket_ts * 1000:8.1f} ms ({bucket_iso / bucket_ts:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
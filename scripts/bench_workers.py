@@ -0,0 +1,116 @@
+"""Benchmark de requests/seg con 1, 2 y 4 workers de uvicorn.
+
+Levanta la app con STATE_BACKEND=sqlite (estado compartido entre workers),
+siembra órdenes sintéticas y golpea los endpoints de lectura de /orders
+con N clientes concurrentes durante unos segundos.
+
+Uso:
+    python scripts/bench_workers.py [--orders 500] [--seconds 10] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PATHS = ("/orders/", "/orders/summary", "/notifications/stock-alert")
+
+
+def seed(db_path: str, n: int) -> None:
+    os.environ["STATE_BACKEND"] = "sqlite"
+    os.environ["STATE_DB_PATH"] = db_path
+    from app.models import Order, OrderItem, ShippingPriority
+    from app.state import SQLiteBackend
+
+    backend = SQLiteBackend(db_path)
+    now = datetime.now(timezone.utc)
+    priorities = list(ShippingPriority)[:3]
+    for i in range(n):
+        backend.put_order(Order(
+            order_id=2000000000 + i,
+            buyer_nickname=f"buyer{i}",
+            items=[OrderItem(item_id=f"MLM{i % 50}", title=f"Producto {i % 50}", quantity=1 + i % 3, sku=f"SKU{i % 50}")],
+            shipping_id=4000000000 + i,
+            shipping_priority=priorities[i % 3],
+            shipping_deadline=now + timedelta(hours=i % 72),
+            date_created=now - timedelta(minutes=i),
+            total_amount=199.0 + i,
+        ))
+
+
+async def load(port: int, seconds: float, concurrency: int) -> int:
+    done = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        async def worker(i: int):
+            nonlocal done
+            n = i
+            while time.perf_counter() < deadline:
+                r = await client.get(PATHS[n % len(PATHS)])
+                r.raise_for_status()
+                done += 1
+                n += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return done
+
+
+def wait_ready(port: int, timeout: float = 30) -> None:
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+def run(workers: int, db_path: str, args) -> float:
+    port = args.port + workers
+    env = dict(os.environ, STATE_BACKEND="sqlite", STATE_DB_PATH=db_path, ALLOWED_IPS="")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_ready(port)
+        asyncio.run(load(port, 1, args.concurrency))  # calentamiento
+        done = asyncio.run(load(port, args.seconds, args.concurrency))
+        return done / args.seconds
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8700)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "state.db")
+        seed(db_path, args.orders)
+        print(f"{args.orders} órdenes, {args.concurrency} clientes, {args.seconds:.0f}s por corrida")
+        for workers in (1, 2, 4):
+            rps = run(workers, db_path, args)
+            print(f"workers={workers}  {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Receptor local de avisos push para probar PUSH_HTTP_URL sin un servicio real.
+
+Imprime cada lote que llega y la latencia de sus eventos (desde que la app
+detectó el pedido urgente/demorado hasta que el lote llegó aquí).
+
+Uso:
+    python scripts/push_receiver.py [--port 8099]
+    PUSH_HTTP_URL=http://127.0.0.1:8099/ uvicorn main:app
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class PushHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        received = time.time()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            message = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        latencies = sorted(received - e["created_at"] for e in message.get("events", []))
+        stamp = time.strftime("%H:%M:%S", time.localtime(received))
+        print(f"[{stamp}] {message.get('title')}  ({len(latencies)} evento(s))")
+        print("    " + message.get("body", "").replace("\n", "\n    "))
+        if latencies:
+            print(f"    latencia min {latencies[0]:.2f}s  max {latencies[-1]:.2f}s")
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    print(f"Escuchando avisos en http://127.0.0.1:{args.port}/")
+    HTTPServer(("127.0.0.1", args.port), PushHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from app.ip_allowlist import IPAccessControl
+
+
+def test_cidr_and_ipv6():
+    access = IPAccessControl("10.0.0.0/8, 2001:db8::/32", "")
+    assert access.is_allowed("10.1.2.3", None)
+    assert access.is_allowed("::ffff:10.1.2.3", None)
+    assert access.is_allowed("2001:db8::1", None)
+    assert not access.is_allowed("11.0.0.1", None)
+
+
+def test_empty_list_allows_everyone():
+    assert IPAccessControl("", "*").is_allowed("9.9.9.9", None)
+
+
+def test_list_without_valid_entries_denies_everyone():
+    # Separada por espacios: ninguna entrada es válida
+    access = IPAccessControl("1.2.3.4 5.6.7.8", "*")
+    assert not access.is_allowed("9.9.9.9", None)
+    assert not access.is_allowed("1.2.3.4", None)
+
+
+def test_trusted_proxies_walk_forwarded_for():
+    access = IPAccessControl("10.0.0.0/8", "100.64.0.0/10")
+    assert access.client_ip("100.64.0.2", "9.9.9.9, 10.0.0.1, 100.64.0.9") == "10.0.0.1"
+    # Una conexión que no es proxy de confianza no puede elegir su IP
+    assert not access.is_allowed("5.5.5.5", "10.0.0.1")
@@ -0,0 +1,18 @@
+from app.live import LiveHub
+
+
+def test_reconnect_from_state_reached_by_empty_batch():
+    hub = LiveHub()
+    hub.publish_batch("a", [{"type": "new"}])
+    hub.publish_batch("b", [])
+    hub.publish_batch("c", [{"type": "gone"}])
+    queue = hub.subscribe("b", current_state="c")
+    assert queue.get_nowait() == ("c:0", {"type": "gone"})
+    assert queue.empty()
+
+
+def test_unknown_state_gets_reset():
+    hub = LiveHub()
+    hub.publish_batch("a", [{"type": "new"}])
+    queue = hub.subscribe("zz", current_state="a")
+    assert queue.get_nowait() == ("a", {"type": "reset"})
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from app.models import Order, OrderItem, ShippingPriority
+from app.order_manager import OrderManager
+from app.state import MemoryBackend
+
+
+def _order(order_id: int, priority=ShippingPriority.NORMAL) -> Order:
+    return Order(
+        order_id=order_id,
+        buyer_nickname="buyer",
+        items=[OrderItem(item_id="MLM1", title="Álbum", quantity=2, sku="SKU1")],
+        shipping_priority=priority,
+        shipping_deadline=datetime.now(timezone.utc) + timedelta(hours=1),
+        status="paid",
+        date_created=datetime.now(timezone.utc),
+        total_amount=100,
+    )
+
+
+def test_threadpool_sync_does_not_double_apply_own_write():
+    written = threading.Event()
+    reader_replaying = threading.Event()
+    writer_done = threading.Event()
+
+    class PausingBackend(MemoryBackend):
+        """Tras escribir, deja que el lector del threadpool entre a _replay."""
+
+        def put_order(self, order, change_type="updated"):
+            version = super().put_order(order, change_type)
+            if order.shipping_priority == ShippingPriority.URGENT:
+                written.set()
+                reader_replaying.wait(0.3)
+            return version
+
+    class PausingManager(OrderManager):
+        def _unindex(self, order):
+            if threading.current_thread() is reader:
+                reader_replaying.set()
+                writer_done.wait(0.3)
+            super()._unindex(order)
+
+    manager = PausingManager(PausingBackend())
+
+    def read():
+        written.wait(1)
+        manager.get_pending_count()  # como un endpoint síncrono: hace _sync()
+
+    reader = threading.Thread(target=read)
+
+    async def write():
+        await manager.add_order(_order(1))
+        reader.start()
+        await manager.add_order(_order(1, ShippingPriority.URGENT))
+        writer_done.set()
+
+    asyncio.run(write())
+    reader.join()
+
+    assert len(manager._pack_keys) == 1
+    assert len(manager._deadline_keys) == 1
+    assert manager.get_total_units() == 2
+    assert manager.get_product_totals()[0]["total_sold"] == 2
+    assert [o.order_id for o in manager.get_urgent_orders()] == [1]
+    assert manager.version == manager.backend.version()
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from app.push import PushDispatcher, PushTransport
+from app.state import MemoryBackend, SQLiteBackend
+
+
+class RecordingTransport(PushTransport):
+    name = "recording"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sends: list[tuple[float, list[str]]] = []
+
+    async def send(self, message: dict) -> None:
+        await asyncio.sleep(self.latency)
+        self.sends.append((time.time(), [e["order_id"] for e in message["events"]]))
+
+
+def test_rate_limit_under_concurrent_notify():
+    transport = RecordingTransport(latency=0.05)
+    dispatcher = PushDispatcher(batch_seconds=0.02, dedupe_seconds=60, backend=MemoryBackend())
+    dispatcher.add_transport(transport, min_interval=0.2)
+
+    async def producer(n: int):
+        for i in range(10):
+            dispatcher.notify(f"{n}-{i}", "urgent", "x")
+            await asyncio.sleep(0.03)
+
+    async def run():
+        await asyncio.gather(*(producer(n) for n in range(5)))
+        while dispatcher.channels["recording"].task is not None:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    times = [at for at, _ in transport.sends]
+    assert len(times) >= 2
+    # Entre dos envíos (medidos al terminar) pasa al menos min_interval
+    assert all(b - a >= 0.2 for a, b in zip(times, times[1:]))
+    sent = [order_id for _, ids in transport.sends for order_id in ids]
+    assert sorted(sent) == sorted(f"{n}-{i}" for n in range(5) for i in range(10))
+    assert dispatcher.channels["recording"].rate_limited > 0
+
+
+def test_dedupe_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    workers = [PushDispatcher(0, 60, SQLiteBackend(path)) for _ in range(2)]
+    for dispatcher in workers:
+        dispatcher.add_transport(RecordingTransport(), min_interval=0)
+
+    async def run():
+        for dispatcher in workers:
+            dispatcher.notify(1, "urgent", "x")
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert [len(d.channels["recording"].transport.sends) for d in workers] == [1, 0]
+    assert workers[1].deduped == 1